@@ -0,0 +1,195 @@
+"""HTTP API for documentation and XAML modification jobs.
+
+    python api_server.py --port 8600 --workers 4
+
+    POST   /jobs/docs          {"files": [{"name", "content"}]}
+    POST   /jobs/modify        {"files": [...], "request": "...", "file_indices": [0], "update_docs": true}
+    GET    /jobs/<id>          status and progress
+    GET    /jobs/<id>/result   result of a finished job (409 while it is still queued or running)
+    DELETE /jobs/<id>          cancel
+    GET    /health             queue statistics
+
+Jobs run on a worker pool, so a slow model call never blocks other requests. When
+LLM4REUSE_API_TOKEN is set, every request needs an "Authorization: Bearer <token>" header.
+"""
+import argparse
+import hmac
+import json
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from jobs import JobQueue, DONE, FAILED, CANCELLED
+from llm_service import configure_client, generate_combined_docs
+from workflow_service import analyze_request, modify_files
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+JOB_PATH = re.compile(r'^/jobs/([0-9a-f]{32})(/result)?$')
+
+
+def docs_job(job, files):
+    job.report({'stage': 'documenting'})
+    documentation = generate_combined_docs(
+        files, on_progress=lambda partial: job.report({'stage': 'documenting', 'characters': len(partial)}))
+    return {'documentation': documentation}
+
+
+def modify_job(job, files, request, file_indices=None, update_docs=True):
+    if file_indices is None:
+        job.report({'stage': 'routing'})
+        file_indices = analyze_request(request, [f['name'] for f in files]).get('file_indices') or []
+        if not file_indices and len(files) == 1:
+            file_indices = [0]
+
+    job.report({'stage': 'modifying', 'files': len(file_indices)})
+    modified = modify_files(
+        files, file_indices, request,
+        lambda done, total: job.report({'stage': 'modifying', 'files': total, 'done': done}))
+    files = [dict(f, content=modified.get(idx, f['content'])) for idx, f in enumerate(files)]
+    result = {'files': files, 'modified': [files[idx]['name'] for idx in modified]}
+
+    if update_docs and modified:
+        result.update(docs_job(job, files))
+    return result
+
+
+def validate_files(files):
+    if not isinstance(files, list) or not files:
+        raise ValueError("'files' must be a non-empty list")
+    for f in files:
+        if not isinstance(f, dict) or not isinstance(f.get('name'), str) or not isinstance(f.get('content'), str):
+            raise ValueError("every file needs a string 'name' and 'content'")
+    return [{'name': f['name'], 'content': f['content']} for f in files]
+
+
+def validate_file_indices(file_indices, file_count):
+    if file_indices is None:
+        return None
+    if not isinstance(file_indices, list):
+        raise ValueError("'file_indices' must be a list")
+    for idx in file_indices:
+        # bool is an int subclass, but true/false are no file indices
+        if not isinstance(idx, int) or isinstance(idx, bool) or not 0 <= idx < file_count:
+            raise ValueError(f"'file_indices' must hold indices of the given files (0 to {file_count - 1}), got {idx!r}")
+    return file_indices
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "LLM4Reuse"
+    job_queue = None
+    token = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        header = self.headers.get('Authorization', '')
+        if hmac.compare_digest(header, f"Bearer {self.token}"):
+            return True
+        self._send_json(401, {'error': "missing or invalid bearer token"})
+        return False
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"request body over {MAX_BODY_BYTES} bytes")
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError("request body must be a JSON object")
+        return data
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            data = self._read_json()
+            files = validate_files(data.get('files'))
+            if self.path == '/jobs/docs':
+                job = self.job_queue.submit('docs', docs_job, files)
+            elif self.path == '/jobs/modify':
+                if not isinstance(data.get('request'), str) or not data['request'].strip():
+                    raise ValueError("'request' must be a non-empty string")
+                file_indices = validate_file_indices(data.get('file_indices'), len(files))
+                job = self.job_queue.submit('modify', modify_job, files, data['request'], file_indices,
+                                            bool(data.get('update_docs', True)))
+            else:
+                self._send_json(404, {'error': "not found"})
+                return
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(202, job.to_dict())
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/health':
+            self._send_json(200, self.job_queue.stats())
+            return
+
+        match = JOB_PATH.match(self.path)
+        job = self.job_queue.get(match.group(1)) if match else None
+        if job is None:
+            self._send_json(404, {'error': "unknown job"})
+        elif not match.group(2):
+            self._send_json(200, job.to_dict())
+        elif job.status == DONE:
+            self._send_json(200, job.result)
+        elif job.status in (FAILED, CANCELLED):
+            self._send_json(410 if job.status == CANCELLED else 500, job.to_dict())
+        else:
+            self._send_json(409, job.to_dict())
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        match = JOB_PATH.match(self.path)
+        if not match or match.group(2):
+            self._send_json(404, {'error': "not found"})
+            return
+        job_id = match.group(1)
+        if self.job_queue.cancel(job_id):
+            self._send_json(202, self.job_queue.get(job_id).to_dict())
+        elif self.job_queue.get(job_id) is not None:
+            self._send_json(409, self.job_queue.get(job_id).to_dict())
+        else:
+            self._send_json(404, {'error': "unknown job"})
+
+
+def create_server(host='127.0.0.1', port=8600, workers=4, token=None):
+    """Build the HTTP server with its own job queue; call serve_forever() on the result"""
+    handler = type('Handler', (ApiHandler,), {'job_queue': JobQueue(workers), 'token': token})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve documentation and modification jobs over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('-w', '--workers', type=int, default=4, help="jobs processed at the same time")
+    parser.add_argument('--backend', help="LLM backend: openai (default) or mock for offline runs")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    configure_client(os.environ.get('OPENAI_API_KEY'), os.environ.get('OPENAI_BASE_URL'),
+                     args.backend or os.environ.get('LLM4REUSE_LLM_BACKEND'))
+    server = create_server(args.host, args.port, args.workers, os.environ.get('LLM4REUSE_API_TOKEN'))
+    print(f"Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.job_queue.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,19 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import openai
 import os
-from zipfile import ZipFile
-import io
-import re
-import json
 from xaml_visualizer import render_xaml_visualization
+from llm_service import configure_client, needs_api_key
+from intent_router import routing_stats
+from version_store import VersionStore
+from diff_engine import paginate_hunks, generate_diff_html, generate_structural_diff_html
+from workflow_service import (
+    process_chat_message, document_project, unique_file_name,
+    create_download_zip, commit_version, version_diffs, describe_version_changes
+)
+from jobs import JobQueue, DONE, FAILED
+from telemetry import context as telemetry_context, recent_events, summarize
 import time
-import copy
-import datetime
-import difflib
+import uuid
 from html import escape
 
 st.set_page_config(page_title="LLM4Reuse", layout="wide", initial_sidebar_state="collapsed")
@@ -18,21 +21,33 @@ st.set_page_config(page_title="LLM4Reuse", layout="wide", initial_sidebar_state=
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "temp_uploads")
 
-if not st.secrets['OPENAI_API_KEY']:
+if needs_api_key() and not st.secrets.get('OPENAI_API_KEY'):
     st.error("Missing required API key in secrets.toml!")
     st.stop()
 
-openai.api_key = st.secrets['OPENAI_API_KEY']
-MODEL_CONFIG = {
-    'model': "gpt-5",
-    'max_tokens': 100000,
-    'temperature': 0.1
+# Without an API key to read, secrets.toml is optional (e.g. LLM4REUSE_LLM_BACKEND=mock)
+configure_client(api_key=st.secrets.get('OPENAI_API_KEY') if needs_api_key() else None)
+
+# Diffs are rendered page by page, a page holds at most this many diff lines
+DIFF_CONFIG = {
+    'lines_per_page': 400,
+    'panel_height': 700
+}
+
+# Only render the selected file instead of every tab on each rerun; model calls run as background
+# jobs that the page polls, so the UI stays usable while they run
+UI_CONFIG = {
+    'lazy_file_tabs': not os.environ.get('LLM4REUSE_RENDER_ALL_TABS'),
+    'job_workers': 4,
+    'poll_interval': 1.0
 }
 
 if 'files' not in st.session_state:
     st.session_state.files = []
 if 'documentation' not in st.session_state:
     st.session_state.documentation = ""
+if 'doc_sections' not in st.session_state:
+    st.session_state.doc_sections = {}
 if 'initialized' not in st.session_state:
     st.session_state.initialized = False
 if 'chat_history' not in st.session_state:
@@ -49,8 +64,8 @@ if 'previous_upload_count' not in st.session_state:
     st.session_state.previous_upload_count = 0
 
 # Version control variables
-if 'version_history' not in st.session_state:
-    st.session_state.version_history = []
+if 'version_store' not in st.session_state:
+    st.session_state.version_store = VersionStore()
 if 'current_version_index' not in st.session_state:
     st.session_state.current_version_index = -1
 if 'versions_available' not in st.session_state:
@@ -59,6 +74,12 @@ if 'versions_available' not in st.session_state:
 # Add diff view mode to session state
 if 'diff_view_mode' not in st.session_state:
     st.session_state.diff_view_mode = False
+if 'active_job' not in st.session_state:
+    st.session_state.active_job = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'diff_granularity' not in st.session_state:
+    st.session_state.diff_granularity = "Activities"
 
 # Add these new session state variables
 if 'editing_documentation' not in st.session_state:
@@ -315,6 +336,15 @@ st.markdown("""
     .diff-unchanged {
         border-left: 4px solid transparent;
     }
+    .diff-changed {
+        background-color: #b08800;
+        border-left: 4px solid #735c0f;
+        color: #ffffff;
+    }
+    .diff-path {
+        opacity: 0.7;
+        font-size: 0.85em;
+    }
     .diff-added-char {
         background-color: #26a745;
     }
@@ -357,174 +387,35 @@ st.markdown("""
     </script>
 """, unsafe_allow_html=True)
 
-def show_loading_indicator(message="Processing..."):
-    """Display a global loading indicator with animation"""
-    loading_placeholder = st.empty()
-    loading_placeholder.markdown(f"""
-    <div class="loading-container">
-        <div class="loading-animation"></div>
-        <div class="loading-text">{message}</div>
-    </div>
-    """, unsafe_allow_html=True)
-    return loading_placeholder
-
-def show_section_loading(container, message="Processing..."):
-    """Display a loading indicator that overlays only a specific section"""
-    container.markdown(f"""
-    <div class="overlay-container">
-        <div class="loading-animation"></div>
-        <div class="loading-text">{message}</div>
-    </div>
-    """, unsafe_allow_html=True)
-    return container
-
-def make_openai_call(prompt: str, custom_max_tokens: int = None, responseJsonFormat: bool = False, llm_model: str = None) -> str:
-    try:
-        if llm_model is None:
-            response = openai.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                max_completion_tokens=custom_max_tokens or MODEL_CONFIG['max_tokens'],
-                model=MODEL_CONFIG['model'] if llm_model is None else llm_model,
-                response_format={"type": "json_object" if responseJsonFormat else "text"},
-                reasoning_effort="high"
-            )
-        else:
-            response = openai.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                max_completion_tokens=custom_max_tokens or MODEL_CONFIG['max_tokens'],
-                model=MODEL_CONFIG['model'] if llm_model is None else llm_model,
-                response_format={"type": "json_object" if responseJsonFormat else "text"},
-            )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        st.error(f"OpenAI API Error: {str(e)}")
-        st.stop()
-
-def clean_code_output(code_text):
-    code_text = re.sub(r'```xml\s*\n', '', code_text)
-    code_text = re.sub(r'\n```\s*$', '', code_text)
-    return code_text
-
-def generate_combined_docs(xaml_files):
-    if not xaml_files:
-        return ""
+def render_documentation(container, documentation):
+    """Render the documentation panel into a container, also used while it is still streaming in"""
+    container.markdown(
+        '<div class="section-container documentation-container">'
+        f'{documentation}'
+        '</div>',
+        unsafe_allow_html=True
+    )
+
+def render_paginated_diff(hunks, key):
+    """Render diff hunks one page at a time so huge diffs don't freeze the page"""
+    pages = paginate_hunks(hunks, DIFF_CONFIG['lines_per_page'])
+    page = 1
     
-    all_content = "\n\n".join(f"{f['content']}" for f in xaml_files)
-
-    prompt = f"""
-    Create a comprehensive documentation for this UiPath workflow that contains all informations should be not shortly.
-    Rules:
-    1. IGNORE standard libraries (System.*, Microsoft.*, UiPath.*, mscorlib)
-    2. Write the documentation directly without any comments
-    3. Write the documentation in a clear and concise manner
-    4. Always adhere to the prompting from the user. If they want a change to the structure, content or anything else, you will implement it
-    5. Be detailed in the documentation, try not to be general, but go into detail related to the code.
-    4. Focus on:
-       - Overall workflow purpose and flow
-       - Business logic
-       - Dependencies and requirements
-       - File interactions
-       - Custom implementations
-       - Data flow
-       - Inputs/outputs
-       - Potential errors and exceptions (Should focus more on the details from code, not general suggestions. Should include also privacy issues when personal data is involved, like privacy-sensitive data in non-compliant ways)
-       - Possible improvements with priorities (Should focus more on the details from code, not general suggestions, also where it can be implemented, how it should be used and why)
-       - Conclusion
-    5. Format the documentation using proper Markdown syntax:
-       - Use # for main titles, ## for subtitles, ### for section headers
-       - Use * or - for bullet points
-       - Use **bold** and *italic* for emphasis
-       - Use proper headings hierarchy for better readability
-       - Use `code` formatting for property names, activities, or code references
-       - Use > for important notes or highlights
-       - Include horizontal rules (---) to separate major sections
-       - Use emojis where appropriate to enhance readability (📁, 🔄, ✅, etc.)
-    6. Start directly with the Overview section and continue with the rest of the content
-
-    XAML content:
-    {all_content}
-    """
-    raw_docs = make_openai_call(prompt)
-    return raw_docs
-
-def generate_diff_html(old_text, new_text, context_lines=3):
-    """Generate HTML that shows differences between two texts with context"""
-    if old_text == new_text:
-        return f"<div class='diff-header'>No changes</div><pre class='diff'>{escape(new_text)}</pre>"
-    
-    old_lines = old_text.splitlines()
-    new_lines = new_text.splitlines()
-    
-    # Use difflib to get the differences
-    differ = difflib.unified_diff(old_lines, new_lines, n=context_lines, lineterm='')
-    
-    # Skip the first two lines (--- and +++)
-    diff_lines = list(differ)[2:]
-    
-    html_parts = ['<div class="diff">']
-    
-    for line in diff_lines:
-        if line.startswith('+'):
-            html_parts.append(f'<span class="diff-line diff-added">{escape(line)}</span>')
-        elif line.startswith('-'):
-            html_parts.append(f'<span class="diff-line diff-removed">{escape(line)}</span>')
-        elif line.startswith('@@'):
-            html_parts.append(f'<span class="diff-line diff-header">{escape(line)}</span>')
-        else:
-            html_parts.append(f'<span class="diff-line diff-unchanged">{escape(line)}</span>')
+    if len(pages) > 1:
+        page_key = f"diff_page_{key}"
+        if st.session_state.get(page_key, 1) > len(pages):
+            st.session_state[page_key] = 1
+        page = st.number_input(f"Diff page (of {len(pages)})", min_value=1, max_value=len(pages), step=1, key=page_key)
     
-    html_parts.append('</div>')
-    return ''.join(html_parts)
-
-def generate_diff_for_files(old_files, new_files):
-    """Generate diff HTML for all files that have changed"""
-    html_parts = []
-    
-    # Map files by name for easier comparison
-    old_files_map = {f['name']: f['content'] for f in old_files}
-    new_files_map = {f['name']: f['content'] for f in new_files}
-    
-    # Files that exist in both versions or only in new version
-    for file_name, new_content in new_files_map.items():
-        if file_name in old_files_map:
-            old_content = old_files_map[file_name]
-            if old_content != new_content:
-                html_parts.append(f'<div class="diff-file-header">{file_name} (modified)</div>')
-                html_parts.append(generate_diff_html(old_content, new_content))
-        else:
-            html_parts.append(f'<div class="diff-file-header">{file_name} (new file)</div>')
-            html_parts.append(generate_diff_html("", new_content))
-    
-    # Files that were deleted
-    for file_name in old_files_map:
-        if file_name not in new_files_map:
-            html_parts.append(f'<div class="diff-file-header">{file_name} (deleted)</div>')
-            html_parts.append(generate_diff_html(old_files_map[file_name], ""))
-    
-    return ''.join(html_parts)
+    st.markdown(generate_diff_html(pages[page - 1]), unsafe_allow_html=True)
 
 def save_version():
     """Save current state as a new version"""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # If we're at a previous version, remove all versions after current one
-    if st.session_state.current_version_index < len(st.session_state.version_history) - 1:
-        st.session_state.version_history = st.session_state.version_history[:st.session_state.current_version_index + 1]
-    
-    # Create a deep copy of files to avoid reference issues
-    files_copy = copy.deepcopy(st.session_state.files)
-    
-    # Save current state
-    version = {
-        'timestamp': timestamp,
-        'files': files_copy,
-        'documentation': st.session_state.documentation,
-        'version_number': len(st.session_state.version_history) + 1
-    }
-    
-    st.session_state.version_history.append(version)
-    st.session_state.current_version_index = len(st.session_state.version_history) - 1
-    st.session_state.versions_available = len(st.session_state.version_history)
+    # If we're at a previous version, all versions after the current one are dropped
+    st.session_state.current_version_index = commit_version(
+        st.session_state.version_store, st.session_state.files, st.session_state.documentation,
+        st.session_state.current_version_index)
+    st.session_state.versions_available = len(st.session_state.version_store)
 
 def toggle_documentation_editing():
     """Toggle documentation editing mode"""
@@ -563,30 +454,20 @@ def save_code_edits(file_index):
 
 def navigate_version(index, show_diff=False):
     """Navigate to a specific version and optionally show diff"""
-    if 0 <= index < len(st.session_state.version_history):
-        # Get the previous version for comparison if showing diff
-        previous_index = index - 1
-        if show_diff and previous_index >= 0:
-            previous_version = st.session_state.version_history[previous_index]
-            
-            # Navigate to the selected version
-            version = st.session_state.version_history[index]
-            
-            # Generate diff between previous version and current version
-            st.session_state.code_diff = generate_diff_for_files(
-                previous_version['files'], version['files'])
-            
-            st.session_state.docs_diff = generate_diff_html(
-                previous_version['documentation'], version['documentation'])
+    version_store = st.session_state.version_store
+    if 0 <= index < len(version_store):
+        files, documentation = version_store.checkout(index)
+        
+        # Compare with the previous version if showing diff, the first version has nothing to compare with
+        if show_diff:
+            diffs = version_diffs(version_store, index)
         else:
-            # If it's the first version or diff view is off, clear diffs
-            st.session_state.code_diff = None
-            st.session_state.docs_diff = None
+            diffs = (None, None, None)
+        st.session_state.docs_diff, st.session_state.code_diff, st.session_state.structure_diff = diffs
         
         # Navigate to the selected version
-        version = st.session_state.version_history[index]
-        st.session_state.files = copy.deepcopy(version['files'])
-        st.session_state.documentation = version['documentation']
+        st.session_state.files = files
+        st.session_state.documentation = documentation
         st.session_state.current_version_index = index
         
         return True
@@ -610,192 +491,133 @@ def toggle_diff_view():
         # Clear any existing diff
         st.session_state.code_diff = None
         st.session_state.docs_diff = None
+        st.session_state.structure_diff = None
     
     st.rerun()
 
-def handle_input(user_input: str):
-    if not user_input or not user_input.strip():
+@st.cache_resource
+def get_job_queue():
+    """Worker pool shared by all sessions, model calls run here instead of in the script thread"""
+    return JobQueue(UI_CONFIG['job_workers'])
+
+def start_job(kind, fn, *args):
+    """Run fn(*args, on_progress=...) in the background; its result is applied by finish_job"""
+    session_id = st.session_state.session_id
+
+    def run(job):
+        # Tag the job's model calls with the session for the usage panel
+        with telemetry_context(session=session_id):
+            return fn(*args, on_progress=job.report)
+
+    job = get_job_queue().submit(kind, run)
+    st.session_state.active_job = {
+        'id': job.id,
+        'kind': kind,
+        'base_version': st.session_state.current_version_index
+    }
+
+def finish_job(job):
+    """Apply the result of the session's finished background job"""
+    active = st.session_state.active_job
+    st.session_state.active_job = None
+
+    if job is None:
+        st.session_state.chat_history.append({"role": "assistant", "content": "The background task was lost, please try again."})
+    elif job.status == DONE:
+        result = job.result
+        st.session_state.doc_sections = result['doc_sections']
+        for message in result['messages']:
+            st.session_state.chat_history.append({"role": "assistant", "content": message})
+        if result['changed']:
+            # The job worked on the version that was current when it started, its result becomes the next one
+            st.session_state.files = result['files']
+            st.session_state.documentation = result['documentation']
+            st.session_state.current_version_index = active['base_version']
+            save_version()
+            if st.session_state.diff_view_mode:
+                navigate_version(st.session_state.current_version_index, True)
+    elif job.status == FAILED:
+        st.session_state.chat_history.append({"role": "assistant", "content": f"Error: {job.error}"})
+    else:
+        st.session_state.chat_history.append({"role": "assistant", "content": "The request was cancelled."})
+
+def get_active_job():
+    active = st.session_state.active_job
+    return get_job_queue().get(active['id']) if active else None
+
+@st.fragment(run_every=UI_CONFIG['poll_interval'])
+def show_job_status():
+    """Poll the background job, showing its progress until it finishes"""
+    if st.session_state.active_job is None:
         return
-    
-    docs_container = st.empty()
-    code_container = st.empty()
-    
-    try:
-        analysis_prompt = f"""
-        Based on the user's request, determine what actions should be taken.
-        Return a JSON object with these fields:
-        - "modify_code": boolean (true if code should change)
-        - "modify_docs": boolean (true if documentation should change)
-        - "explain": boolean (true if user is asking a question that needs explanation)
-        - "file_indices": array of integers (indices of files to modify, 0-indexed)
-        
-        Here are the available files:
-        {', '.join(f"{i}: {f['name']}" for i, f in enumerate(st.session_state.files))}
-        
-        User's request: {user_input}
-        
-        JSON RESPONSE:
-        """
-        
-        analysis_response = make_openai_call(analysis_prompt, 16000, True, llm_model="gpt-4o-mini")
-        
-        try:
-            analysis = json.loads(analysis_response)
-        except:
-            analysis = {
-                "modify_code": False,
-                "modify_docs": False,
-                "explain": False,
-                "file_indices": []
-            }
+    job = get_active_job()
+    if job is None or job.finished:
+        finish_job(job)
+        st.rerun()
 
-        changes_made = False
+    progress = job.progress or {}
+    with st.chat_message("assistant"):
+        if progress.get('explanation'):
+            st.markdown(progress['explanation'])
+        else:
+            st.markdown(f"⏳ {progress.get('stage', 'Waiting for a free worker...')}")
+        if job.cancel_requested:
+            st.caption("Cancelling...")
+        elif st.button("✖ Cancel", key="cancel_job"):
+            get_job_queue().cancel(job.id)
+
+@st.fragment(run_every=UI_CONFIG['poll_interval'])
+def show_documentation_progress():
+    """Show the documentation as the background job writes it"""
+    job = get_active_job()
+    progress = (job.progress if job is not None else None) or {}
+    render_documentation(st.empty(), progress.get('documentation') or st.session_state.documentation)
+
+def show_usage_summary():
+    """Model calls of this session per call site: tokens, cost and latency"""
+    events = recent_events(session=st.session_state.session_id)
+    if not events:
+        st.caption("No model calls yet.")
+        return
+    summary = summarize(events)
+    st.dataframe([
+        {
+            'Call site': name,
+            'Calls': values['calls'],
+            'Cached': values['cache_hits'],
+            'Errors': values['errors'],
+            'Tokens in': values['prompt_tokens'],
+            'Tokens out': values['completion_tokens'],
+            'Reasoning': values['reasoning_tokens'],
+            'Cost (USD)': values['cost_usd'],
+            'Mean s': values['seconds_mean'],
+            'p95 s': values['seconds_p95']
+        }
+        for name, values in summary.items()
+    ], hide_index=True)
+    total_cost = sum(values['cost_usd'] for values in summary.values())
+    total_seconds = sum(values['seconds_total'] for values in summary.values())
+    st.caption(f"{len(events)} calls, {total_seconds:.1f}s waiting for the model, about ${total_cost:.4f}")
 
-        if analysis.get("modify_code", False):
-            show_section_loading(code_container, "Updating XAML code...")
-            
-            file_indices = analysis.get("file_indices", [st.session_state.get('active_tab', 0)])
-            modified_files = []
-            
-            for idx in file_indices:
-                if idx < len(st.session_state.files):
-                    file_content = st.session_state.files[idx]['content']
-                    file_name = st.session_state.files[idx]['name']
-                    
-                    files_context = "\n".join([
-                        f"File {i}: {f['name']}" 
-                        for i, f in enumerate(st.session_state.files)
-                    ])
-                    
-                    modify_prompt = f"""
-                    Modify this UiPath XAML code according to the user's request:
-                    {user_input}
-                    Return only the complete modified XAML code.
-                    
-                    Available files:
-                    {files_context}
-                    
-                    Working on file: {file_name}
-                    
-                    Original code:
-                    {file_content}
-                    """
-                    
-                    modified_code = make_openai_call(modify_prompt)
-                    st.session_state.files[idx]['content'] = clean_code_output(modified_code)
-                    modified_files.append(file_name)
-            
-            if modified_files:
-                changes_made = True
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": f"Updated files: {', '.join(modified_files)}"
-                })
-            
-            code_container.empty()
-        
-        if analysis.get("modify_docs", False):
-            show_section_loading(docs_container, "Updating documentation...")
-            
-            st.session_state.documentation = generate_combined_docs(st.session_state.files)
-            changes_made = True
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": "Documentation has been updated."
-            })
-            
-            docs_container.empty()
-            
-        if analysis.get("explain", False):
-            file_indices = analysis.get("file_indices", [])
-            
-            files_context = ""
-            if file_indices:
-                for idx in file_indices:
-                    if idx < len(st.session_state.files):
-                        files_context += f"\nFile: {st.session_state.files[idx]['name']}\n"
-                        files_context += f"{st.session_state.files[idx]['content']}\n\n"
-            else:
-                files_context = "\n".join([
-                    f"File {i}: {f['name']}" 
-                    for i, f in enumerate(st.session_state.files)
-                ])
-            
-            explanation_prompt = f"""
-            The user has the following question about the UiPath workflow:
-            {user_input}
-            
-            Please provide a detailed and helpful explanation based on the available information.
-            
-            Documentation:
-            {st.session_state.documentation}
-            
-            Code context:
-            {files_context}
-            """
-            
-            explanation = make_openai_call(explanation_prompt)
-            
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": explanation
-            })
-        
-        if not analysis.get("modify_code", False) and not analysis.get("modify_docs", False) and not analysis.get("explain", False):
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": "I understood your request, but I'm not sure how to help. Could you please provide more details or rephrase your question?"
-            })
-        
-        # Save version if changes were made
-        if changes_made:
-            save_version()
-        
-    except Exception as e:
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": f"Error: {str(e)}"
-        })
+def handle_input(user_input: str):
+    if not user_input or not user_input.strip():
+        return
     
-    finally:
-        docs_container.empty()
-        code_container.empty()
-
-def create_download_zip():
-    memory_file = io.BytesIO()
-    with ZipFile(memory_file, 'w') as zf:
-        for file in st.session_state.files:
-            zf.writestr(file['name'], file['content'])
-        if st.session_state.documentation:
-            zf.writestr('documentation.txt', st.session_state.documentation)
-    memory_file.seek(0)
-    return memory_file
+    # The job gets its own copies, the page keeps working on the session's files meanwhile
+    start_job("chat", process_chat_message, [dict(f) for f in st.session_state.files], st.session_state.documentation,
+              dict(st.session_state.doc_sections), user_input, st.session_state.get('active_tab', 0))
 
 def handle_additional_file_upload():
     """Handle the upload of additional XAML files after initial setup"""
     try:
         additional_files = st.session_state.additional_files
         
-        if additional_files:
-            code_container = st.empty()
-            docs_container = st.empty()
-            
+        if additional_files and st.session_state.active_job is None:
             new_files = []
             for file in additional_files:
                 content = file.read().decode('utf-8')
                 
-                base_name = file.name
-                file_name = base_name
-                counter = 1
-                
-                existing_names = [f['name'] for f in st.session_state.files]
-                while file_name in existing_names:
-                    name_parts = base_name.rsplit('.', 1)
-                    if len(name_parts) > 1:
-                        file_name = f"{name_parts[0]}_{counter}.{name_parts[1]}"
-                    else:
-                        file_name = f"{base_name}_{counter}"
-                    counter += 1
+                file_name = unique_file_name(file.name, [f['name'] for f in st.session_state.files])
                 
                 new_file = {
                     'name': file_name,
@@ -803,20 +625,8 @@ def handle_additional_file_upload():
                 }
                 new_files.append(new_file)
                 st.session_state.files.append(new_file)
-            
-            show_section_loading(code_container, "Processing new files...")
-            st.session_state.documentation = generate_combined_docs(st.session_state.files)
-            
-            # Save new version after file upload
-            save_version()
-            
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": f"Added {len(new_files)} new file(s) and updated documentation."
-            })
-            
-            code_container.empty()
-            docs_container.empty()
+            start_job("upload", document_project, [dict(f) for f in st.session_state.files], dict(st.session_state.doc_sections),
+                      f"Added {len(new_files)} new file(s) and updated documentation.")
     except Exception as e:
         st.error(f"Error processing files: {str(e)}")
 
@@ -825,6 +635,84 @@ def handle_additional_file_change():
     if len(st.session_state.additional_files or []) > 0:
         handle_additional_file_upload()
 
+def render_file_panel(i):
+    """Render the visualization, code view or diff of one file"""
+    xaml_content = st.session_state.files[i]['content']
+    file_name = st.session_state.files[i]['name']
+
+    # Check if we're in diff mode and have diff content for this file
+    if st.session_state.diff_view_mode:
+        if st.session_state.current_version_index == 0:
+            # First version - show message
+            st.markdown('<div class="no-diff-message">This is the first version. No previous version to compare with.</div>', unsafe_allow_html=True)
+            if st.session_state.global_view_mode == "code":
+                st.text_area("", value=xaml_content, height=600, key=f"xaml_{i}", disabled=True)
+            else:
+                html_content = render_xaml_visualization(xaml_content)
+                components.html(html_content, height=600, scrolling=True)
+        else:
+            file_diff = (getattr(st.session_state, 'code_diff', None) or {}).get(file_name)
+            if file_diff:
+                st.markdown(f'<div class="diff-file-header">{escape(file_name)} ({file_diff["status"]})</div>', unsafe_allow_html=True)
+                st.radio("Diff granularity", ["Activities", "Lines"], horizontal=True,
+                         key="diff_granularity", label_visibility="collapsed")
+                
+                # Fall back to the line diff when the XAML can't be parsed
+                structure = (getattr(st.session_state, 'structure_diff', None) or {}).get(file_name)
+                if st.session_state.diff_granularity == "Activities" and structure is not None:
+                    if structure:
+                        st.markdown(generate_structural_diff_html(structure), unsafe_allow_html=True)
+                    else:
+                        st.markdown('<div class="no-diff-message">Only formatting and designer data changed in this file.</div>', unsafe_allow_html=True)
+                else:
+                    render_paginated_diff(file_diff['hunks'], f"file_{file_name}")
+                return
+
+            # If no diff found for this file
+            st.markdown('<div class="no-diff-message">No changes detected in this file.</div>', unsafe_allow_html=True)
+            if st.session_state.global_view_mode == "code":
+                st.text_area("", value=xaml_content, height=600, key=f"xaml_{i}", disabled=True)
+            else:
+                html_content = render_xaml_visualization(xaml_content)
+                components.html(html_content, height=600, scrolling=True)
+    else:
+        # Normal view mode
+        if st.session_state.global_view_mode == "code":
+            # Add code editing buttons
+            edit_code_col1, edit_code_col2 = st.columns(2)
+
+            with edit_code_col1:
+                if st.button("✏️ Edit Code", key=f"toggle_code_edit_{i}"):
+                    toggle_code_editing(i)
+                    st.rerun()
+
+            is_editing = st.session_state.editing_code.get(i, False)
+
+            # Show editable or read-only text area based on editing mode
+            if is_editing:
+                st.text_area(
+                    "",
+                    value=xaml_content,
+                    height=600,
+                    key=f"edited_xaml_{i}",
+                    disabled=False
+                )
+
+                with edit_code_col2:
+                    if st.button("💾 Save Code", key=f"save_code_edit_{i}", disabled=st.session_state.active_job is not None):
+                        save_code_edits(i)
+            else:
+                st.text_area(
+                    "",
+                    value=xaml_content,
+                    height=600,
+                    key=f"xaml_{i}",
+                    disabled=True
+                )
+        else:
+            html_content = render_xaml_visualization(xaml_content)
+            components.html(html_content, height=650, scrolling=True)
+
 def show_main_interface():
     # Add a top header row with all controls
     st.markdown("<h3 style='text-align:center; margin-bottom:15px;'>LLM4Reuse</h3>", unsafe_allow_html=True)
@@ -834,7 +722,7 @@ def show_main_interface():
     
     with header_cols[0]:
         # Version navigation on the left
-        if len(st.session_state.version_history) > 0:
+        if len(st.session_state.version_store) > 0:
             version_cols = st.columns([1, 2, 1, 1])
             with version_cols[0]:
                 prev_disabled = st.session_state.current_version_index <= 0
@@ -842,11 +730,15 @@ def show_main_interface():
                     handle_version_navigation(-1)
             
             with version_cols[1]:
-                version_text = f"V{st.session_state.current_version_index + 1}/{len(st.session_state.version_history)}"
-                st.markdown(f"<div class='version-info' style='text-align:center'>{version_text}</div>", unsafe_allow_html=True)
+                version_text = f"V{st.session_state.current_version_index + 1}/{len(st.session_state.version_store)}"
+                footprint = st.session_state.version_store.memory_footprint()
+                footprint_text = (f"History: {footprint['stored_bytes'] / 1024:.0f} KB stored, "
+                                  f"{footprint['snapshot_bytes'] / 1024:.0f} KB as full snapshots")
+                changes_text = describe_version_changes(st.session_state.version_store, st.session_state.current_version_index)
+                st.markdown(f"<div class='version-info' style='text-align:center' title='{changes_text}. {footprint_text}'>{version_text}</div>", unsafe_allow_html=True)
             
             with version_cols[2]:
-                next_disabled = st.session_state.current_version_index >= len(st.session_state.version_history) - 1
+                next_disabled = st.session_state.current_version_index >= len(st.session_state.version_store) - 1
                 if st.button("▶", key="next_version", disabled=next_disabled):
                     handle_version_navigation(1)
                     
@@ -878,7 +770,8 @@ def show_main_interface():
         """, unsafe_allow_html=True)
         
         st.file_uploader("Upload additional files", accept_multiple_files=True, key="additional_files", 
-                         type=['xaml'], on_change=handle_additional_file_change, label_visibility="collapsed")
+                         type=['xaml'], on_change=handle_additional_file_change, label_visibility="collapsed",
+                         disabled=st.session_state.active_job is not None)
     
     with header_cols[2]:
         # Download and toggle buttons on the right
@@ -886,7 +779,7 @@ def show_main_interface():
         with button_cols[0]:
             st.download_button(
                 "📥 Download",
-                data=create_download_zip(),
+                data=create_download_zip(st.session_state.files, st.session_state.documentation),
                 file_name="workflow_package.zip",
                 mime="application/zip"
             )
@@ -900,13 +793,16 @@ def show_main_interface():
     st.markdown("<hr style='margin:10px 0;'>", unsafe_allow_html=True)
 
     # Main content
-    st.markdown('''
+    routing = routing_stats()
+    routing_text = (f"{routing['local']} of {routing['total']} messages routed locally, "
+                    f"{routing['llm'] + routing['llm_failed']} by the model")
+    st.markdown(f'''
     <div style="display:flex; align-items:center; justify-content:space-between; margin-bottom:0.5rem;">
       <div style="flex:1;">
         <h5 style="margin:0; text-align:left;">Documentation</h5>
       </div>
       <div style="flex:1;">
-        <h5 style="margin:0; text-align:center;">Assistant</h5>
+        <h5 style="margin:0; text-align:center;" title="{routing_text}">Assistant</h5>
       </div>
       <div style="flex:1;">
         <h5 style="margin:0;">XAML Code</h5>
@@ -915,17 +811,14 @@ def show_main_interface():
     ''', unsafe_allow_html=True)
 
     cols = st.columns(3)
+    job_running = st.session_state.active_job is not None
 
     with cols[0]:
         # Documentation - show diff or normal view
         if st.session_state.diff_view_mode:
             if st.session_state.current_version_index > 0 and getattr(st.session_state, 'docs_diff', None):
-                st.markdown(
-                    '<div class="section-container documentation-container">'
-                    f'{st.session_state.docs_diff}'
-                    '</div>',
-                    unsafe_allow_html=True
-                )
+                with st.container(height=DIFF_CONFIG['panel_height']):
+                    render_paginated_diff(st.session_state.docs_diff, "documentation")
             elif st.session_state.current_version_index == 0:
                 st.markdown(
                     '<div class="section-container documentation-container">'
@@ -943,17 +836,15 @@ def show_main_interface():
                     unsafe_allow_html=True
                 )
         else:
-            st.markdown(
-                '<div class="section-container documentation-container">'
-                f'{st.session_state.documentation}'
-                '</div>',
-                unsafe_allow_html=True
-            )
+            if st.session_state.active_job is not None:
+                show_documentation_progress()
+            else:
+                render_documentation(st.empty(), st.session_state.documentation)
             
             # Add documentation editing controls
             edit_doc_col1, edit_doc_col2 = st.columns(2)
             with edit_doc_col1:
-                if st.button("✏️ Edit Documentation", key="toggle_doc_edit"):
+                if st.button("✏️ Edit Documentation", key="toggle_doc_edit", disabled=job_running):
                     toggle_documentation_editing()
                     st.rerun()
             
@@ -965,7 +856,7 @@ def show_main_interface():
                             key="edited_documentation")
                 
                 with edit_doc_col2:
-                    if st.button("💾 Save Documentation", key="save_doc_edit"):
+                    if st.button("💾 Save Documentation", key="save_doc_edit", disabled=job_running):
                         save_documentation_edits()
 
     with cols[1]:
@@ -980,9 +871,11 @@ def show_main_interface():
                     with st.chat_message(msg["role"]):
                         st.write(msg["content"])
                 st.markdown('</div>', unsafe_allow_html=True)
+                if job_running:
+                    show_job_status()
             
             with st.container():
-                user_input = st.chat_input("Type your message here...", key="chat_input")
+                user_input = st.chat_input("Type your message here...", key="chat_input", disabled=job_running)
                 
                 if user_input:
                     st.session_state.user_input = user_input
@@ -992,84 +885,36 @@ def show_main_interface():
             
             st.markdown('</div>', unsafe_allow_html=True)
 
+        with st.expander("📊 Model usage in this session"):
+            show_usage_summary()
+
     with cols[2]:
         st.markdown('''<div class="section-container">''', unsafe_allow_html=True)
         
-        tabs = st.tabs([f.get('name') for f in st.session_state.files])
-        
-        for i, tab in enumerate(tabs):
-            with tab:
-                st.session_state.active_tab = i
-                
-                xaml_content = st.session_state.files[i]['content']
-                file_name = st.session_state.files[i]['name']
-                
-                # Check if we're in diff mode and have diff content for this file
-                if st.session_state.diff_view_mode:
-                    if st.session_state.current_version_index == 0:
-                        # First version - show message
-                        st.markdown('<div class="no-diff-message">This is the first version. No previous version to compare with.</div>', unsafe_allow_html=True)
-                        if st.session_state.global_view_mode == "code":
-                            st.text_area("", value=xaml_content, height=600, key=f"xaml_{i}", disabled=True)
-                        else:
-                            html_content = render_xaml_visualization(xaml_content)
-                            components.html(html_content, height=600, scrolling=True)
-                    elif getattr(st.session_state, 'code_diff', None):
-                        # Extract this file's diff if available
-                        if f'<div class="diff-file-header">{file_name}' in st.session_state.code_diff:
-                            # Extract this file's diff using regex
-                            file_diff_pattern = f'<div class="diff-file-header">{re.escape(file_name)}.*?(?=<div class="diff-file-header">|$)'
-                            file_diff_match = re.search(file_diff_pattern, st.session_state.code_diff, re.DOTALL)
-                            
-                            if file_diff_match:
-                                file_diff = file_diff_match.group(0)
-                                st.markdown(file_diff, unsafe_allow_html=True)
-                                continue
-                        
-                        # If no diff found for this file
-                        st.markdown('<div class="no-diff-message">No changes detected in this file.</div>', unsafe_allow_html=True)
-                        if st.session_state.global_view_mode == "code":
-                            st.text_area("", value=xaml_content, height=600, key=f"xaml_{i}", disabled=True)
-                        else:
-                            html_content = render_xaml_visualization(xaml_content)
-                            components.html(html_content, height=600, scrolling=True)
-                else:
-                    # Normal view mode
-                    if st.session_state.global_view_mode == "code":
-                        # Add code editing buttons
-                        edit_code_col1, edit_code_col2 = st.columns(2)
-                        
-                        with edit_code_col1:
-                            if st.button("✏️ Edit Code", key=f"toggle_code_edit_{i}"):
-                                toggle_code_editing(i)
-                                st.rerun()
-                        
-                        is_editing = st.session_state.editing_code.get(i, False)
-                        
-                        # Show editable or read-only text area based on editing mode
-                        if is_editing:
-                            st.text_area(
-                                "",
-                                value=xaml_content,
-                                height=600,
-                                key=f"edited_xaml_{i}",
-                                disabled=False
-                            )
-                            
-                            with edit_code_col2:
-                                if st.button("💾 Save Code", key=f"save_code_edit_{i}"):
-                                    save_code_edits(i)
-                        else:
-                            st.text_area(
-                                "",
-                                value=xaml_content,
-                                height=600,
-                                key=f"xaml_{i}",
-                                disabled=True
-                            )
-                    else:
-                        html_content = render_xaml_visualization(xaml_content)
-                        components.html(html_content, height=650, scrolling=True)
+        file_names = [f.get('name') for f in st.session_state.files]
+
+        if UI_CONFIG['lazy_file_tabs']:
+            # Only the selected file is rendered, the others are materialized once they are selected
+            if st.session_state.get('active_file', 0) >= len(file_names):
+                st.session_state.active_file = 0
+            selected = st.radio(
+                "File",
+                range(len(file_names)),
+                format_func=lambda i: file_names[i],
+                horizontal=True,
+                key="active_file",
+                label_visibility="collapsed"
+            )
+            if selected is not None:
+                st.session_state.active_tab = selected
+                render_file_panel(selected)
+        else:
+            tabs = st.tabs(file_names)
+            
+            for i, tab in enumerate(tabs):
+                with tab:
+                    st.session_state.active_tab = i
+                    render_file_panel(i)
         
         st.markdown('''</div>''', unsafe_allow_html=True)
 
@@ -1077,8 +922,6 @@ if not st.session_state.initialized:
     uploaded_files = st.file_uploader("Upload XAML files", accept_multiple_files=True, type=['xaml'])
 
     if uploaded_files:
-        loading_indicator = show_loading_indicator("Processing uploaded files...")
-        
         new_files = []
         for file in uploaded_files:
             content = file.read().decode('utf-8')
@@ -1087,14 +930,10 @@ if not st.session_state.initialized:
                 'content': content
             })
         
+        # The files can be browsed right away, the documentation and the initial version follow from the job
         st.session_state.files = new_files
-        st.session_state.documentation = generate_combined_docs(new_files)
         st.session_state.initialized = True
-        
-        # Create initial version
-        save_version()
-        
-        loading_indicator.empty()
+        start_job("upload", document_project, new_files, st.session_state.doc_sections, None)
         st.rerun()
 else:
     show_main_interface()
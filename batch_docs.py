@@ -0,0 +1,271 @@
+"""Document whole folders of UiPath projects without the Streamlit app.
+
+    python batch_docs.py projects/ exports/*.zip --output docs/ --workers 4
+
+Every directory with a project.json (or else every directory holding .xaml files) and every ZIP
+archive is documented as one project. Finished projects are recorded in a checkpoint file, so an
+interrupted run picks up where it stopped when it is started again with the same output folder.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from zipfile import ZipFile, BadZipFile
+from dotenv import load_dotenv
+from llm_service import configure_client, generate_combined_docs, needs_api_key
+from telemetry import context as telemetry_context
+
+CHECKPOINT_FILE = ".checkpoint.json"
+SUMMARY_FILE = "summary.json"
+
+
+def _project_roots(paths):
+    """Pick the project directories out of a list of file paths (posix style, relative to one root)"""
+    roots = {os.path.dirname(path) for path in paths if os.path.basename(path) == 'project.json'}
+    projects = {}
+    for path in paths:
+        if not path.lower().endswith('.xaml'):
+            continue
+        directory = os.path.dirname(path)
+        # The closest enclosing project.json wins, files outside any project are grouped by folder
+        root = directory
+        while root not in roots and root:
+            root = os.path.dirname(root)
+        if root not in roots:
+            root = directory
+        projects.setdefault(root, []).append(path)
+    return projects
+
+
+def _read_text(data):
+    return data.decode('utf-8-sig', errors='replace')
+
+
+def discover_projects(inputs):
+    """Yield (project_id, loader) for every project found in the given directories and ZIP archives.
+
+    loader() returns the project's files as [{'name', 'content'}], named relative to the project root.
+    """
+    for input_path in inputs:
+        input_path = os.path.abspath(input_path)
+        if os.path.isfile(input_path) and input_path.lower().endswith('.zip'):
+            yield from _zip_projects(input_path)
+            continue
+
+        if os.path.isfile(input_path):
+            base, paths = os.path.dirname(input_path), [os.path.basename(input_path)]
+        else:
+            base, paths = input_path, []
+            for directory, dirnames, filenames in os.walk(input_path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                relative = os.path.relpath(directory, input_path)
+                for filename in sorted(filenames):
+                    path = filename if relative == '.' else os.path.join(relative, filename)
+                    if filename.lower().endswith('.zip'):
+                        yield from _zip_projects(os.path.join(input_path, path))
+                    else:
+                        paths.append(path.replace(os.sep, '/'))
+
+        for root, files in sorted(_project_roots(paths).items()):
+            project_id = os.path.join(base, root).replace(os.sep, '/')
+            yield project_id, _directory_loader(base, root, files)
+
+
+def _directory_loader(base, root, files):
+    def load():
+        loaded = []
+        for path in files:
+            with open(os.path.join(base, path), 'rb') as f:
+                loaded.append({'name': os.path.relpath(path, root or '.').replace(os.sep, '/'), 'content': _read_text(f.read())})
+        return loaded
+    return load
+
+
+def _zip_projects(zip_path):
+    try:
+        with ZipFile(zip_path) as zf:
+            names = [name for name in zf.namelist() if not name.endswith('/')]
+    except (BadZipFile, OSError) as e:
+        print(f"Skipping {zip_path}: {e}", file=sys.stderr)
+        return
+
+    for root, files in sorted(_project_roots(names).items()):
+        project_id = f"{zip_path.replace(os.sep, '/')}!/{root}" if root else zip_path.replace(os.sep, '/')
+        yield project_id, _zip_loader(zip_path, root, files)
+
+
+def _zip_loader(zip_path, root, files):
+    def load():
+        with ZipFile(zip_path) as zf:
+            return [{'name': os.path.relpath(path, root or '.').replace(os.sep, '/'), 'content': _read_text(zf.read(path))}
+                    for path in files]
+    return load
+
+
+def project_hash(files):
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(f['name'].encode('utf-8') + b'\0' + f['content'].encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def output_name(project_id):
+    """Readable, unique and filesystem-safe Markdown file name for a project"""
+    readable = re.sub(r'[^A-Za-z0-9._-]+', '_', project_id.strip('/')).strip('_')[-80:]
+    return f"{readable}_{hashlib.sha256(project_id.encode('utf-8')).hexdigest()[:8]}.md"
+
+
+class Checkpoint:
+    """JSON record of finished projects, rewritten atomically after every project"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def is_done(self, project_id, content_hash, output_dir):
+        entry = self.entries.get(project_id)
+        return (entry is not None and entry.get('status') == 'done' and entry.get('hash') == content_hash
+                and os.path.exists(os.path.join(output_dir, entry['output'])))
+
+    def record(self, project_id, entry):
+        with self._lock:
+            self.entries[project_id] = entry
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+def document_project(project_id, load, output_dir, checkpoint):
+    """Document one project and return its checkpoint entry"""
+    started = time.monotonic()
+    files = load()
+    if not files:
+        return {'status': 'skipped', 'reason': 'no XAML files'}
+
+    content_hash = project_hash(files)
+    if checkpoint.is_done(project_id, content_hash, output_dir):
+        return dict(checkpoint.entries[project_id], status='cached')
+
+    with telemetry_context(project=project_id):
+        documentation = generate_combined_docs(files)
+    output = output_name(project_id)
+    with open(os.path.join(output_dir, output), 'w', encoding='utf-8') as f:
+        f.write(f"<!-- Generated from {project_id} on {datetime.datetime.now():%Y-%m-%d %H:%M:%S} -->\n\n")
+        f.write(documentation)
+
+    entry = {
+        'status': 'done',
+        'hash': content_hash,
+        'output': output,
+        'files': len(files),
+        'bytes': sum(len(f['content']) for f in files),
+        'seconds': round(time.monotonic() - started, 3)
+    }
+    checkpoint.record(project_id, entry)
+    return entry
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(results, wall_seconds):
+    """Throughput and latency over the projects documented in this run"""
+    counts = {}
+    for entry in results.values():
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+
+    latencies = [entry['seconds'] for entry in results.values() if entry['status'] == 'done']
+    summary = {
+        'projects': len(results),
+        'counts': counts,
+        'wall_seconds': round(wall_seconds, 3),
+        'files_documented': sum(entry.get('files', 0) for entry in results.values() if entry['status'] == 'done'),
+        'projects_per_minute': round(len(latencies) / wall_seconds * 60, 2) if wall_seconds and latencies else 0.0
+    }
+    if latencies:
+        summary['latency_seconds'] = {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(_percentile(latencies, 0.5), 3),
+            'p95': round(_percentile(latencies, 0.95), 3),
+            'max': round(max(latencies), 3)
+        }
+    return summary
+
+
+def run_batch(inputs, output_dir, workers=2, checkpoint_path=None):
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(output_dir, CHECKPOINT_FILE))
+    projects = list(discover_projects(inputs))
+    print(f"Found {len(projects)} project(s)", file=sys.stderr)
+
+    results = {}
+    started = time.monotonic()
+    # Every project already runs its per-file calls on a pool of its own, so this pool stays small
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(document_project, project_id, load, output_dir, checkpoint): project_id
+            for project_id, load in projects
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            project_id = futures[future]
+            try:
+                results[project_id] = future.result()
+            except Exception as e:
+                results[project_id] = {'status': 'failed', 'error': str(e)}
+            entry = results[project_id]
+            detail = f" in {entry['seconds']:.1f}s" if entry['status'] == 'done' else ""
+            print(f"[{done}/{len(projects)}] {entry['status']}{detail}: {project_id}", file=sys.stderr)
+
+    summary = summarize(results, time.monotonic() - started)
+    summary['results'] = results
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Markdown documentation for folders and ZIP archives of UiPath projects.")
+    parser.add_argument('inputs', nargs='+', help="directories, XAML files or ZIP archives")
+    parser.add_argument('-o', '--output', default='docs_output', help="folder for the Markdown files, the checkpoint and summary.json")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="projects documented at the same time")
+    parser.add_argument('--checkpoint', help=f"checkpoint file (default: <output>/{CHECKPOINT_FILE})")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and document every project again")
+    parser.add_argument('--backend', help="LLM backend: openai (default) or mock for offline runs")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    configure_client(os.environ.get('OPENAI_API_KEY'), os.environ.get('OPENAI_BASE_URL'),
+                     args.backend or os.environ.get('LLM4REUSE_LLM_BACKEND'))
+    if needs_api_key() and not os.environ.get('OPENAI_API_KEY'):
+        parser.error("OPENAI_API_KEY is not set (environment or .env file)")
+
+    checkpoint_path = args.checkpoint or os.path.join(args.output, CHECKPOINT_FILE)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    summary = run_batch(args.inputs, args.output, args.workers, checkpoint_path)
+    counts = ", ".join(f"{count} {status}" for status, count in sorted(summary['counts'].items()))
+    print(f"{summary['projects']} project(s): {counts or 'nothing to do'} in {summary['wall_seconds']:.1f}s "
+          f"({summary['projects_per_minute']} projects/min)")
+    if 'latency_seconds' in summary:
+        latency = summary['latency_seconds']
+        print(f"Latency per project: mean {latency['mean']}s, p50 {latency['p50']}s, p95 {latency['p95']}s, max {latency['max']}s")
+    return 1 if summary['counts'].get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
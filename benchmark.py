@@ -0,0 +1,259 @@
+"""Time and peak memory of the XAML hot paths on synthetic UiPath workflows of growing size.
+
+    python benchmark.py                                   # small, medium and large preset
+    python benchmark.py --activities 500 5000 --depth 30 --image-bytes 20000
+    python benchmark.py --save-baseline bench.json        # record the current numbers
+    python benchmark.py --compare bench.json              # exit 1 if a stage got slower or bigger
+
+Stages: building the element tree (stream_xaml_tree), process_node, parse_xaml_to_dict (both together),
+generate_visual_html, the line diff and its HTML, the activity diff and create_download_zip. Times are
+the median of --repeat runs; peak memory is measured in a separate run under tracemalloc.
+"""
+import argparse
+import base64
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from diff_engine import _compute_hunks, diff_trees, generate_diff_html
+from workflow_service import create_download_zip
+from xaml_visualizer import _parse_with_lxml, generate_visual_html, parse_xaml_to_dict, process_node
+
+PRESETS = {
+    'small': {'activities': 100, 'depth': 5, 'image_bytes': 0, 'arguments': 5},
+    'medium': {'activities': 1000, 'depth': 15, 'image_bytes': 2000, 'arguments': 20},
+    'large': {'activities': 5000, 'depth': 40, 'image_bytes': 10000, 'arguments': 50}
+}
+
+# A stage regresses when it is this much slower (or uses this much more memory) than the baseline;
+# stages faster than min_seconds are too noisy to compare
+REGRESSION_CONFIG = {
+    'tolerance': 0.25,
+    'min_seconds': 0.005
+}
+
+HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<Activity mc:Ignorable="sap sap2010" x:Class="Main" '
+    'xmlns="http://schemas.microsoft.com/netfx/2009/xaml/activities" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:sap="http://schemas.microsoft.com/netfx/2009/xaml/activities/presentation" '
+    'xmlns:sap2010="http://schemas.microsoft.com/netfx/2010/xaml/activities/presentation" '
+    'xmlns:scg="clr-namespace:System.Collections.Generic;assembly=mscorlib" '
+    'xmlns:ui="http://schemas.uipath.com/workflow/activities" '
+    'xmlns:x="http://schemas.microsoft.com/winfx/2006/xaml">\n'
+)
+
+VIEW_STATE = (
+    '<sap:WorkflowViewStateService.ViewState><scg:Dictionary x:TypeArguments="x:String, x:Object">'
+    '<x:Boolean x:Key="IsExpanded">True</x:Boolean></scg:Dictionary></sap:WorkflowViewStateService.ViewState>'
+)
+
+
+def _image(rng, size):
+    # A PNG signature keeps is_base64_image's fast path, the rest is noise of the requested size
+    return base64.b64encode(b'\x89PNG\r\n\x1a\n' + rng.randbytes(max(0, size - 8))).decode('ascii')
+
+
+def _activity(index, rng, image_bytes):
+    kind = index % 5
+    if kind == 0:
+        return (f'<Assign DisplayName="Assign {index}" sap2010:WorkflowViewState.IdRef="Assign_{index}">'
+                f'<Assign.To><OutArgument x:TypeArguments="x:String">[var{index % 10}]</OutArgument></Assign.To>'
+                f'<Assign.Value><InArgument x:TypeArguments="x:String">"value {index}"</InArgument></Assign.Value></Assign>')
+    if kind == 1:
+        return (f'<ui:LogMessage DisplayName="Log {index}" Level="Info" Message="[&quot;Step {index}&quot;]" '
+                f'sap2010:Annotation.AnnotationText="Logs step {index}" sap2010:WorkflowViewState.IdRef="LogMessage_{index}" />')
+    if kind == 2:
+        return f'<ui:MessageBox DisplayName="Message {index}" Text="[var{index % 10}]" sap2010:WorkflowViewState.IdRef="MessageBox_{index}" />'
+    if kind == 3:
+        image = f' Image="{_image(rng, image_bytes)}"' if image_bytes else ''
+        return f'<ui:TypeInto DisplayName="Type {index}" Text="text {index}"{image} sap2010:WorkflowViewState.IdRef="TypeInto_{index}" />'
+    return (f'<ui:InvokeWorkflowFile DisplayName="Invoke {index}" WorkflowFileName="Sub{index % 7}.xaml" '
+            f'sap2010:WorkflowViewState.IdRef="InvokeWorkflowFile_{index}"><ui:InvokeWorkflowFile.Arguments>'
+            f'<InArgument x:TypeArguments="x:String" x:Key="in_Value">[var{index % 10}]</InArgument>'
+            f'<OutArgument x:TypeArguments="x:String" x:Key="out_Result">[var{(index + 1) % 10}]</OutArgument>'
+            f'</ui:InvokeWorkflowFile.Arguments></ui:InvokeWorkflowFile>')
+
+
+def _container(level):
+    """Opening and closing markup of the container at a nesting level: Sequence, If or TryCatch"""
+    kind = level % 3
+    if kind == 0:
+        return (f'<Sequence DisplayName="Sequence {level}" sap2010:WorkflowViewState.IdRef="Sequence_{level}">{VIEW_STATE}',
+                '</Sequence>')
+    if kind == 1:
+        return (f'<If Condition="[var{level % 10}.Length &gt; {level}]" DisplayName="If {level}" '
+                f'sap2010:WorkflowViewState.IdRef="If_{level}"><If.Then><Sequence DisplayName="Then {level}">',
+                '</Sequence></If.Then></If>')
+    return (f'<TryCatch DisplayName="Try {level}" sap2010:WorkflowViewState.IdRef="TryCatch_{level}">'
+            f'<TryCatch.Try><Sequence DisplayName="Try body {level}">',
+            '</Sequence></TryCatch.Try></TryCatch>')
+
+
+def generate_workflow(activities=100, depth=5, image_bytes=0, arguments=5, seed=0):
+    """Synthetic but valid UiPath workflow: activities spread over a chain of depth nested containers"""
+    rng = random.Random(seed)
+    parts = [HEADER, '<x:Members>']
+    parts += [f'<x:Property Name="in_Arg{i}" Type="InArgument(x:String)" />' for i in range(arguments)]
+    parts.append('</x:Members>')
+    parts.append('<Sequence DisplayName="Main" sap2010:WorkflowViewState.IdRef="Sequence_main"><Sequence.Variables>')
+    parts += [f'<Variable x:TypeArguments="x:String" Name="var{i}" />' for i in range(10)]
+    parts.append(f'</Sequence.Variables>{VIEW_STATE}')
+
+    closing = []
+    per_level = max(1, activities // (depth + 1))
+    index = 0
+    for level in range(depth + 1):
+        count = per_level if level < depth else activities - index
+        for _ in range(max(0, count)):
+            parts.append(_activity(index, rng, image_bytes))
+            index += 1
+        if level < depth:
+            opening, close = _container(level)
+            parts.append(opening)
+            closing.append(close)
+    parts += reversed(closing)
+    parts.append('</Sequence>\n</Activity>\n')
+    return "\n".join(parts)
+
+
+def modify_workflow(xaml, fraction=0.05, seed=1):
+    """A changed version for the diff stages: roughly fraction of the activities get a new DisplayName"""
+    rng = random.Random(seed)
+    lines = xaml.split("\n")
+    for index, line in enumerate(lines):
+        if 'DisplayName="' in line and rng.random() < fraction:
+            lines[index] = line.replace('DisplayName="', 'DisplayName="Renamed ', 1)
+    return "\n".join(lines)
+
+
+def build_stages(xaml):
+    """(name, function) pairs; every function does the work of one stage on prepared input"""
+    changed = modify_workflow(xaml)
+    root = _parse_with_lxml(xaml)
+    tree = parse_xaml_to_dict(xaml)
+    changed_tree = parse_xaml_to_dict(changed)
+    hunks = _compute_hunks(xaml, changed, 3)
+    files = [{'name': f"Workflow{i}.xaml", 'content': xaml} for i in range(3)]
+    return [
+        ('element_tree', lambda: _parse_with_lxml(xaml)),
+        ('process_node', lambda: process_node(root.find('Sequence') or root)),
+        ('parse_xaml_to_dict', lambda: parse_xaml_to_dict(xaml)),
+        ('generate_visual_html', lambda: generate_visual_html(tree)),
+        ('line_diff', lambda: _compute_hunks(xaml, changed, 3)),
+        ('diff_html', lambda: generate_diff_html(hunks)),
+        ('activity_diff', lambda: diff_trees(tree, changed_tree)),
+        ('download_zip', lambda: create_download_zip(files, "# Documentation\n" * 200))
+    ]
+
+
+def measure(fn, repeat):
+    """Median wall time over repeat runs and the peak of memory allocated during one more run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(statistics.median(timings), 6), 'peak_bytes': peak}
+
+
+def run_benchmarks(sizes, repeat=5):
+    results = {}
+    for name, params in sizes.items():
+        xaml = generate_workflow(**params)
+        stages = {}
+        for stage, fn in build_stages(xaml):
+            try:
+                stages[stage] = measure(fn, repeat)
+            except RecursionError:
+                stages[stage] = {'error': 'RecursionError'}
+        results[name] = {'params': params, 'xaml_bytes': len(xaml.encode('utf-8')), 'stages': stages}
+    return results
+
+
+def compare(results, baseline, tolerance=None, min_seconds=None):
+    """Stages that got slower or bigger than the baseline by more than tolerance, as readable lines"""
+    tolerance = REGRESSION_CONFIG['tolerance'] if tolerance is None else tolerance
+    min_seconds = REGRESSION_CONFIG['min_seconds'] if min_seconds is None else min_seconds
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None or base['params'] != result['params']:
+            continue
+        for stage, values in result['stages'].items():
+            old = base['stages'].get(stage)
+            if old is None or 'error' in old:
+                continue
+            if 'error' in values:
+                regressions.append(f"{size}/{stage}: {values['error']} (baseline {old['seconds']:.4f}s)")
+                continue
+            if values['seconds'] > max(old['seconds'], min_seconds) * (1 + tolerance):
+                regressions.append(f"{size}/{stage}: {old['seconds']:.4f}s -> {values['seconds']:.4f}s")
+            if values['peak_bytes'] > old['peak_bytes'] * (1 + tolerance) + 64 * 1024:
+                regressions.append(f"{size}/{stage}: peak {old['peak_bytes'] / 1e6:.1f}MB -> {values['peak_bytes'] / 1e6:.1f}MB")
+    return regressions
+
+
+def format_results(results):
+    lines = []
+    for size, result in results.items():
+        params = ", ".join(f"{key}={value}" for key, value in result['params'].items())
+        lines.append(f"{size} ({params}, {result['xaml_bytes'] / 1e6:.2f}MB XAML)")
+        for stage, values in result['stages'].items():
+            if 'error' in values:
+                lines.append(f"  {stage:<22}{values['error']}")
+            else:
+                lines.append(f"  {stage:<22}{values['seconds'] * 1000:>10.2f} ms{values['peak_bytes'] / 1e6:>10.2f} MB peak")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark XAML parsing, rendering, diffing and export.")
+    parser.add_argument('--activities', type=int, nargs='+', help="activity counts to benchmark instead of the presets")
+    parser.add_argument('--depth', type=int, default=10, help="nesting depth of containers (with --activities)")
+    parser.add_argument('--image-bytes', type=int, default=0, help="size of the base64 image on every fifth activity")
+    parser.add_argument('--arguments', type=int, default=10, help="number of workflow arguments")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per stage, the median is reported")
+    parser.add_argument('--save-baseline', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_CONFIG['tolerance'])
+    args = parser.parse_args(argv)
+
+    if args.activities:
+        sizes = {
+            f"{count}x{args.depth}": {'activities': count, 'depth': args.depth,
+                                      'image_bytes': args.image_bytes, 'arguments': args.arguments}
+            for count in args.activities
+        }
+    else:
+        sizes = PRESETS
+
+    results = run_benchmarks(sizes, args.repeat)
+    print(format_results(results))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import difflib
+import hashlib
+import threading
+from collections import OrderedDict
+from html import escape
+from xaml_visualizer import parse_xaml_cached
+
+HUNK_CACHE_SIZE = 256
+
+_hunk_cache = OrderedDict()
+_hunk_cache_lock = threading.Lock()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _compute_hunks(old_text, new_text, context_lines):
+    hunks = []
+    matcher = difflib.SequenceMatcher(None, old_text.splitlines(), new_text.splitlines(), autojunk=False)
+    old_lines = matcher.a
+    new_lines = matcher.b
+
+    for group in matcher.get_grouped_opcodes(context_lines):
+        old_start, old_end = group[0][1], group[-1][2]
+        new_start, new_end = group[0][3], group[-1][4]
+        lines = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                lines.extend((' ', line) for line in old_lines[i1:i2])
+                continue
+            if tag in ('replace', 'delete'):
+                lines.extend(('-', line) for line in old_lines[i1:i2])
+            if tag in ('replace', 'insert'):
+                lines.extend(('+', line) for line in new_lines[j1:j2])
+
+        hunks.append({
+            'header': f"@@ -{old_start + 1},{old_end - old_start} +{new_start + 1},{new_end - new_start} @@",
+            'lines': lines
+        })
+    return hunks
+
+
+def _cached(key, compute):
+    with _hunk_cache_lock:
+        if key in _hunk_cache:
+            _hunk_cache.move_to_end(key)
+            return _hunk_cache[key]
+
+    result = compute()
+
+    with _hunk_cache_lock:
+        _hunk_cache[key] = result
+        while len(_hunk_cache) > HUNK_CACHE_SIZE:
+            _hunk_cache.popitem(last=False)
+    return result
+
+
+def compute_hunks(old_text, new_text, context_lines=3, old_key=None, new_key=None):
+    """Return the unified diff of two texts as a list of hunks ({'header', 'lines': [(tag, line)]}).
+
+    Results are cached by the content hashes, pass old_key/new_key when they are already known.
+    """
+    if old_text == new_text:
+        return []
+
+    key = ('lines', old_key or text_hash(old_text), new_key or text_hash(new_text), context_lines)
+    return _cached(key, lambda: _compute_hunks(old_text, new_text, context_lines))
+
+
+def diff_versions(version_store, old_index, new_index, context_lines=3):
+    """Diff two versions of a VersionStore file by file.
+
+    Returns the documentation hunks and a dict mapping each changed file name to
+    {'status': 'modified' | 'new file' | 'deleted', 'hunks': [...]}.
+    """
+    old_version = version_store.get(old_index)
+    new_version = version_store.get(new_index)
+    old_files = dict(old_version['files'])
+    new_files = dict(new_version['files'])
+
+    def hunks_between(old_key, new_key):
+        old_text = version_store.text(old_key) if old_key else ""
+        new_text = version_store.text(new_key) if new_key else ""
+        return compute_hunks(old_text, new_text, context_lines, old_key or text_hash(""), new_key or text_hash(""))
+
+    file_diffs = {}
+    for name, new_key in new_files.items():
+        old_key = old_files.get(name)
+        if old_key == new_key:
+            continue
+        file_diffs[name] = {
+            'status': 'modified' if old_key else 'new file',
+            'hunks': hunks_between(old_key, new_key)
+        }
+    for name, old_key in old_files.items():
+        if name not in new_files:
+            file_diffs[name] = {'status': 'deleted', 'hunks': hunks_between(old_key, None)}
+
+    docs_hunks = hunks_between(old_version['documentation'], new_version['documentation'])
+    return docs_hunks, file_diffs
+
+
+def paginate_hunks(hunks, lines_per_page):
+    """Cut the hunks into pages of at most lines_per_page lines.
+
+    Hunks longer than a page are split across pages, the continuation keeps the hunk header.
+    """
+    pages = [[]]
+    page_size = 0
+    for hunk in hunks:
+        lines = hunk['lines']
+        start = 0
+        while start < len(lines):
+            if page_size >= lines_per_page:
+                pages.append([])
+                page_size = 0
+            chunk = lines[start:start + lines_per_page - page_size]
+            pages[-1].append({'header': hunk['header'], 'lines': chunk})
+            page_size += len(chunk)
+            start += len(chunk)
+    return pages
+
+
+def _node_label(node):
+    name = node.get('nodeName', 'Unknown')
+    display_name = node.get('displayName')
+    return f'{name} "{display_name}"' if display_name else name
+
+
+def _node_properties(node):
+    """Flatten everything of a parsed node except its children into comparable name/value pairs"""
+    properties = {}
+    for attr in node.get('attributes', []):
+        properties[attr.get('name')] = attr.get('value')
+    for arg in node.get('mainArgs', []):
+        properties[arg.get('name')] = arg.get('value')
+    for image in node.get('base64Images', []):
+        properties[image.get('name')] = text_hash(image.get('value', ''))
+    for arg in node.get('argumentsTable', []):
+        properties[f"Argument {arg.get('name')}"] = f"{arg.get('argType')} {arg.get('value')}"
+    if node.get('annotation'):
+        properties['Annotation'] = node.get('annotation')
+    if node.get('inArgs'):
+        properties['In arguments'] = ", ".join(node.get('inArgs'))
+    if node.get('outArgs'):
+        properties['Out arguments'] = ", ".join(node.get('outArgs'))
+    return properties
+
+
+def _short(value, limit=80):
+    value = str(value)
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+
+def _property_changes(old_node, new_node):
+    old_properties = _node_properties(old_node)
+    new_properties = _node_properties(new_node)
+    # Children are only paired when type and DisplayName agree, but the two roots are always compared
+    for name, field in (('Type', 'nodeName'), ('DisplayName', 'displayName')):
+        old_properties[name] = old_node.get(field)
+        new_properties[name] = new_node.get(field)
+    details = []
+    for name in old_properties.keys() | new_properties.keys():
+        old_value = old_properties.get(name)
+        new_value = new_properties.get(name)
+        if old_value == new_value:
+            continue
+        if old_value is None:
+            details.append(f"{name} added: {_short(new_value)}")
+        elif new_value is None:
+            details.append(f"{name} removed")
+        else:
+            details.append(f"{name}: {_short(old_value)} → {_short(new_value)}")
+    return sorted(details)
+
+
+def _match_children(old_children, new_children):
+    """Pair children by (type, DisplayName) in order, in linear time.
+
+    Returns (pairs, removed, added) where pairs holds matched (old, new) nodes.
+    """
+    positions = {}
+    for index, child in enumerate(new_children):
+        positions.setdefault((child.get('nodeName'), child.get('displayName')), []).append(index)
+
+    pairs = []
+    removed = []
+    matched = set()
+    cursors = {}
+    last_index = -1
+    for old_child in old_children:
+        key = (old_child.get('nodeName'), old_child.get('displayName'))
+        candidates = positions.get(key, [])
+        cursor = cursors.get(key, 0)
+        # Only match forward, so reordered activities show up as removed and added again
+        while cursor < len(candidates) and candidates[cursor] <= last_index:
+            cursor += 1
+        cursors[key] = cursor
+        if cursor < len(candidates):
+            new_index = candidates[cursor]
+            cursors[key] = cursor + 1
+            matched.add(new_index)
+            pairs.append((old_child, new_children[new_index]))
+            last_index = new_index
+        else:
+            removed.append(old_child)
+
+    added = [child for index, child in enumerate(new_children) if index not in matched]
+    return pairs, removed, added
+
+
+def diff_trees(old_root, new_root):
+    """Compare two trees produced by xaml_visualizer.process_node activity by activity.
+
+    Returns a list of {'op': 'added' | 'removed' | 'changed', 'path', 'activity', 'details'} in tree order.
+    """
+    changes = []
+    stack = [(old_root, new_root, "")]
+    while stack:
+        old_node, new_node, path = stack.pop()
+        label = _node_label(new_node)
+
+        details = _property_changes(old_node, new_node)
+        if details:
+            changes.append({'op': 'changed', 'path': path, 'activity': label, 'details': details})
+
+        child_path = f"{path} > {label}" if path else label
+        pairs, removed, added = _match_children(old_node.get('children', []), new_node.get('children', []))
+        for child in removed:
+            changes.append({'op': 'removed', 'path': child_path, 'activity': _node_label(child), 'details': []})
+        for child in added:
+            changes.append({'op': 'added', 'path': child_path, 'activity': _node_label(child), 'details': []})
+        for old_child, new_child in reversed(pairs):
+            stack.append((old_child, new_child, child_path))
+    return changes
+
+
+def _structural_changes(old_xaml, new_xaml):
+    old_tree = parse_xaml_cached(old_xaml) if old_xaml else None
+    new_tree = parse_xaml_cached(new_xaml) if new_xaml else None
+    if (old_tree and 'error' in old_tree) or (new_tree and 'error' in new_tree):
+        return None
+
+    if old_tree is None:
+        return [{'op': 'added', 'path': '', 'activity': _node_label(new_tree), 'details': []}]
+    if new_tree is None:
+        return [{'op': 'removed', 'path': '', 'activity': _node_label(old_tree), 'details': []}]
+    return diff_trees(old_tree, new_tree)
+
+
+def structural_diff(old_xaml, new_xaml, old_key=None, new_key=None):
+    """Activity-level diff of two XAML texts, or None when one of them cannot be parsed"""
+    if old_xaml == new_xaml:
+        return []
+
+    key = ('structure', old_key or text_hash(old_xaml), new_key or text_hash(new_xaml))
+    return _cached(key, lambda: _structural_changes(old_xaml, new_xaml))
+
+
+def structural_diff_versions(version_store, old_index, new_index):
+    """Activity-level changes of every XAML file between two versions, by file name"""
+    old_files = dict(version_store.get(old_index)['files'])
+    new_files = dict(version_store.get(new_index)['files'])
+
+    file_changes = {}
+    for name in list(new_files) + [name for name in old_files if name not in new_files]:
+        old_key = old_files.get(name)
+        new_key = new_files.get(name)
+        if old_key == new_key:
+            continue
+        file_changes[name] = structural_diff(
+            version_store.text(old_key) if old_key else "",
+            version_store.text(new_key) if new_key else "",
+            old_key, new_key)
+    return file_changes
+
+
+def summarize_changes(file_changes):
+    """Count added, removed and changed activities over all files"""
+    counts = {'added': 0, 'removed': 0, 'changed': 0}
+    for changes in file_changes.values():
+        for change in changes or []:
+            counts[change['op']] += 1
+    return counts
+
+
+def generate_diff_html(hunks):
+    """Generate HTML for a list of diff hunks"""
+    html_parts = ['<div class="diff">']
+
+    for hunk in hunks:
+        html_parts.append(f'<span class="diff-line diff-header">{escape(hunk["header"])}</span>')
+        for tag, line in hunk['lines']:
+            if tag == '+':
+                html_parts.append(f'<span class="diff-line diff-added">+{escape(line)}</span>')
+            elif tag == '-':
+                html_parts.append(f'<span class="diff-line diff-removed">-{escape(line)}</span>')
+            else:
+                html_parts.append(f'<span class="diff-line diff-unchanged"> {escape(line)}</span>')
+
+    html_parts.append('</div>')
+    return ''.join(html_parts)
+
+
+def generate_structural_diff_html(changes):
+    """Generate HTML listing activity-level changes"""
+    symbols = {'added': ('+', 'diff-added'), 'removed': ('-', 'diff-removed'), 'changed': ('~', 'diff-changed')}
+    html_parts = ['<div class="diff">']
+
+    for change in changes:
+        symbol, css_class = symbols[change['op']]
+        path = f' <span class="diff-path">in {escape(change["path"])}</span>' if change['path'] else ''
+        html_parts.append(f'<span class="diff-line {css_class}">{symbol} {escape(change["activity"])}{path}</span>')
+        for detail in change['details']:
+            html_parts.append(f'<span class="diff-line diff-unchanged">    {escape(detail)}</span>')
+
+    html_parts.append('</div>')
+    return ''.join(html_parts)
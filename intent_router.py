@@ -0,0 +1,118 @@
+import re
+import threading
+from collections import Counter
+
+# "Do not ..." and "Have the ... do ..." are instructions, not questions
+QUESTION_START = re.compile(
+    r"^(what|why|how|which|where|when|who|whom|whose|does|do(?!\s+not\b)|did|is|are|was|were|has|"
+    r"have(?!\s+the\b)|explain|describe|tell me|show me|walk me through|summari[sz]e|give me an overview)\b")
+POLITE_REQUEST = re.compile(r"^(please\s+)?(can|could|would|will)\s+you\s+(please\s+)?")
+
+CODE_VERBS = {
+    "add", "insert", "remove", "delete", "drop", "rename", "replace", "change", "modify", "update", "set",
+    "fix", "refactor", "move", "wrap", "create", "implement", "make", "append", "prepend", "increase",
+    "decrease", "swap", "surround", "extract", "convert", "disable", "enable", "adjust"
+}
+CODE_OBJECTS = {
+    "activity", "activities", "variable", "variables", "argument", "arguments", "sequence", "flowchart",
+    "condition", "assign", "loop", "foreach", "while", "catch", "try", "selector", "invoke", "workflow",
+    "code", "xaml", "attribute", "property", "properties", "timeout", "displayname", "value", "message",
+    "log", "messagebox", "click", "typeinto", "delay", "retry", "exception", "throw", "if", "else", "switch"
+}
+DOC_WORDS = {
+    "documentation", "docs", "doc", "readme", "description", "heading", "headings", "markdown", "section",
+    "sections", "summary", "chapter", "paragraph", "wording", "translate", "emoji", "emojis"
+}
+ALL_FILES = re.compile(r"\b(all|every|each)\s+(the\s+)?(files|file|workflows|workflow)\b")
+
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9_]+", text))
+
+
+def match_files(text, file_names):
+    """Indices of the files a message refers to by name, or all files for 'all files'"""
+    if ALL_FILES.search(text):
+        return list(range(len(file_names)))
+
+    indices = []
+    for index, name in enumerate(file_names):
+        name = name.lower()
+        stem = name.rsplit('.', 1)[0]
+        if name in text or (len(stem) >= 3 and re.search(rf"(?<![\w.]){re.escape(stem)}(?![\w])", text)):
+            indices.append(index)
+    return indices
+
+
+def classify_intent(user_input, file_names):
+    """Route a chat message without calling the model.
+
+    Returns the same fields as the LLM router ('modify_code', 'modify_docs', 'explain', 'file_indices')
+    plus a 'confidence' between 0 and 1; callers escalate to the model below their threshold.
+    """
+    text = " ".join(user_input.lower().split())
+    polite = POLITE_REQUEST.match(text)
+    if polite:
+        text = text[polite.end():]
+    words = _words(text)
+    file_indices = match_files(text, file_names)
+
+    is_question = not polite and (text.endswith("?") or bool(QUESTION_START.match(text)))
+    has_verb = bool(words & CODE_VERBS)
+    mentions_docs = bool(words & DOC_WORDS)
+    mentions_code = bool(words & CODE_OBJECTS) or bool(file_indices)
+
+    analysis = {
+        "modify_code": False,
+        "modify_docs": False,
+        "explain": False,
+        "file_indices": file_indices,
+        "confidence": 0.0
+    }
+
+    if is_question and not has_verb:
+        analysis.update(explain=True, confidence=0.9)
+    elif is_question:
+        # "How do I add a retry?" might be a question or a change request
+        analysis.update(explain=True, confidence=0.5)
+    elif has_verb and mentions_docs:
+        # "Update the documentation of the Assign activity" is a doc change, "add a log activity and document it" is not
+        analysis.update(modify_docs=True, confidence=0.5 if words & CODE_OBJECTS else 0.9)
+    elif has_verb and mentions_code:
+        # Changed code makes the documentation stale, so it is always regenerated with it
+        analysis.update(modify_code=True, modify_docs=True, confidence=0.85)
+        if not file_indices:
+            if len(file_names) == 1:
+                analysis['file_indices'] = [0]
+            else:
+                # Nothing says which file to change, the model has to work it out
+                analysis['confidence'] = 0.4
+    elif has_verb:
+        analysis.update(modify_code=True, modify_docs=True, confidence=0.5)
+    elif mentions_docs:
+        # "Do not use emojis in the documentation" asks for a doc change without one of the change verbs
+        analysis.update(modify_docs=True, confidence=0.5)
+    return analysis
+
+
+_route_counts = Counter()
+_route_lock = threading.Lock()
+
+
+def record_route(path):
+    """Count how a message was routed: 'local', 'llm' or 'llm_failed'"""
+    with _route_lock:
+        _route_counts[path] += 1
+
+
+def routing_stats():
+    with _route_lock:
+        counts = dict(_route_counts)
+    total = sum(counts.values())
+    return {
+        'total': total,
+        'local': counts.get('local', 0),
+        'llm': counts.get('llm', 0),
+        'llm_failed': counts.get('llm_failed', 0),
+        'local_rate': counts.get('local', 0) / total if total else 0.0
+    }
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+import uuid
+from telemetry import context as telemetry_context
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function by Job.check_cancelled once the job was cancelled"""
+
+
+class Job:
+    """One unit of work in a JobQueue; the function gets the Job to report progress and check for cancellation"""
+
+    def __init__(self, kind, fn, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, progress):
+        """Publish progress (any JSON-serializable value) and stop here if the job was cancelled"""
+        self.progress = progress
+        self.check_cancelled()
+
+    def wait(self, timeout=None):
+        return self._done_event.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """FIFO job queue worked off by a fixed pool of threads.
+
+    Finished jobs are kept for max_age_seconds (at most max_finished of them) so their results can be
+    collected; queued jobs can be cancelled right away, running ones stop at their next report().
+    """
+
+    def __init__(self, workers=4, max_finished=500, max_age_seconds=60 * 60):
+        self.max_finished = max_finished
+        self.max_age_seconds = max_age_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs) and return the Job"""
+        job = Job(kind, fn, args, kwargs)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation, returns False for unknown or already finished jobs"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel_event.set()
+        with self._lock:
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+        return True
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+        for job in jobs:
+            counts[job.status] += 1
+        return {'workers': len(self._threads), 'jobs': counts}
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        # The inputs (whole projects for documentation jobs) are not needed anymore
+        job._args, job._kwargs = (), {}
+        job._done_event.set()
+
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        now = time.time()
+        for index, job in enumerate(finished):
+            if len(finished) - index > self.max_finished or now - job.finished_at > self.max_age_seconds:
+                del self._jobs[job.id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                with telemetry_context(job=job.id):
+                    result = job._fn(job, *job._args, **job._kwargs)
+            except JobCancelled:
+                with self._lock:
+                    self._finish(job, CANCELLED)
+            except Exception as e:
+                with self._lock:
+                    self._finish(job, FAILED, error=str(e))
+            else:
+                with self._lock:
+                    self._finish(job, CANCELLED if job.cancel_requested else DONE, result=result)
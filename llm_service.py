@@ -0,0 +1,598 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_cache import ResponseCache
+from xaml_chunking import estimate_tokens, split_xaml, pack_texts
+from xaml_compaction import compact_xaml
+from shared_cache import get_cache, content_key
+from telemetry import context as telemetry_context, record_call
+from resilience import call_with_retries
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_CONFIG = {
+    'model': os.environ.get('LLM4REUSE_MODEL', "gpt-5"),
+    'router_model': os.environ.get('LLM4REUSE_ROUTER_MODEL', "gpt-4o-mini"),
+    'max_tokens': 100000,
+    'temperature': 0.1
+}
+
+# Responses are cached on disk by a hash of the full request, so identical prompts skip the API
+CACHE_CONFIG = {
+    'enabled': not os.environ.get('LLM4REUSE_DISABLE_CACHE'),
+    'path': os.path.join(BASE_DIR, ".llm_cache", "responses.sqlite3"),
+    'max_entries': 2000,
+    'max_bytes': 200 * 1024 * 1024,
+    'max_age_seconds': 7 * 24 * 60 * 60
+}
+
+# Token budgets for a single documentation prompt; bigger inputs are split and documented map-reduce style
+DOC_BUDGET = {
+    'chunk_tokens': 50000,
+    'reduce_tokens': 50000
+}
+
+# Per-file LLM calls run in parallel; retries and per-model rate limits are handled in resilience.py
+CONCURRENCY_CONFIG = {
+    'max_workers': 4
+}
+
+# Filled in by configure_client(); unset values fall back to the OPENAI_* environment variables.
+# backend picks the client factory from BACKENDS, "mock" answers offline without an API key
+CLIENT_CONFIG = {
+    'api_key': None,
+    'base_url': None,
+    'backend': os.environ.get('LLM4REUSE_LLM_BACKEND', "openai")
+}
+
+
+_client = None
+_client_lock = threading.Lock()
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def _openai_client():
+    import openai
+    # Retries are ours (call_with_retries), the client must not add its own on top
+    return openai.OpenAI(api_key=CLIENT_CONFIG['api_key'], base_url=CLIENT_CONFIG['base_url'], max_retries=0)
+
+
+def _mock_client():
+    from mock_server import MockClient
+    return MockClient()
+
+
+# Factories for objects with the openai.OpenAI interface used here: client.chat.completions.create(...)
+BACKENDS = {
+    'openai': _openai_client,
+    'mock': _mock_client
+}
+
+
+def register_backend(name, factory):
+    """Make another client factory selectable with configure_client(backend=name)"""
+    BACKENDS[name] = factory
+
+
+def configure_client(api_key=None, base_url=None, backend=None):
+    """Set the credentials and backend for the client, which is only built on the first model call.
+
+    Calling it again with the same settings keeps the existing client and its connection pool.
+    """
+    global _client
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    settings = {'api_key': api_key, 'base_url': base_url, 'backend': backend or CLIENT_CONFIG['backend']}
+    with _client_lock:
+        if settings == CLIENT_CONFIG:
+            return
+        CLIENT_CONFIG.update(settings)
+        _client = None
+
+
+def needs_api_key():
+    return CLIENT_CONFIG['backend'] == "openai"
+
+
+def get_client():
+    """The shared client of the configured backend, created on first use so importing this module stays cheap"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = BACKENDS[CLIENT_CONFIG['backend']]()
+    return _client
+
+
+def effective_base_url():
+    """The base URL the client talks to; like the openai client, fall back to OPENAI_BASE_URL"""
+    return CLIENT_CONFIG['base_url'] or os.environ.get('OPENAI_BASE_URL') or None
+
+
+def cache_scope():
+    """Extra cache key fields so answers of a mock or local backend are never served as real ones"""
+    base_url = effective_base_url()
+    if CLIENT_CONFIG['backend'] == "openai" and not base_url:
+        return {}
+    return {'backend': CLIENT_CONFIG['backend'], 'base_url': base_url}
+
+
+def get_response_cache():
+    """Process-wide response cache shared by all sessions, threads and batch runs"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                CACHE_CONFIG['path'],
+                max_entries=CACHE_CONFIG['max_entries'],
+                max_bytes=CACHE_CONFIG['max_bytes'],
+                max_age_seconds=CACHE_CONFIG['max_age_seconds'],
+                enabled=CACHE_CONFIG['enabled']
+            )
+    return _response_cache
+
+
+def build_request(prompt: str, custom_max_tokens: int = None, responseJsonFormat: bool = False, llm_model: str = None) -> dict:
+    request = {
+        'messages': [{"role": "user", "content": prompt}],
+        'max_completion_tokens': custom_max_tokens or MODEL_CONFIG['max_tokens'],
+        'model': MODEL_CONFIG['model'] if llm_model is None else llm_model,
+        'response_format': {"type": "json_object" if responseJsonFormat else "text"},
+    }
+    if llm_model is None:
+        request['reasoning_effort'] = "high"
+    return request
+
+
+def request_completion(prompt: str, custom_max_tokens: int = None, responseJsonFormat: bool = False, llm_model: str = None, use_cache: bool = True, cache: ResponseCache = None, on_finish=None) -> str:
+    """Call the chat completions API and return the text, raising on failure.
+
+    on_finish(complete) is told whether the answer is non-empty and finished with 'stop', i.e. fit to be kept.
+    """
+    request = build_request(prompt, custom_max_tokens, responseJsonFormat, llm_model)
+
+    if cache is None:
+        cache = get_response_cache()
+    cache_key = ResponseCache.make_key(**request, **cache_scope())
+    started = time.monotonic()
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            record_call(request['model'], started, cache='hit')
+            if on_finish is not None:
+                on_finish(True)
+            return cached
+
+    cache_status = 'miss' if use_cache else 'off'
+
+    def attempt(timeout):
+        attempt_started = time.monotonic()
+        try:
+            response = get_client().chat.completions.create(**request, timeout=timeout)
+        except Exception as e:
+            record_call(request['model'], attempt_started, cache=cache_status, error=e)
+            raise
+        record_call(request['model'], attempt_started, getattr(response, 'usage', None), cache_status)
+        return response
+
+    response = call_with_retries(request['model'], attempt)
+    choice = response.choices[0]
+    content = (choice.message.content or "").strip()
+
+    # Truncated (finish_reason 'length') or filtered answers are not worth repeating
+    complete = bool(content) and getattr(choice, 'finish_reason', None) == 'stop'
+    if on_finish is not None:
+        on_finish(complete)
+    if use_cache and complete:
+        cache.set(cache_key, content)
+    return content
+
+
+def forget_completion(prompt: str, custom_max_tokens: int = None, responseJsonFormat: bool = False, llm_model: str = None, cache: ResponseCache = None):
+    """Drop the cached answer to a request, for callers that found it unusable"""
+    request = build_request(prompt, custom_max_tokens, responseJsonFormat, llm_model)
+    (cache or get_response_cache()).delete(ResponseCache.make_key(**request, **cache_scope()))
+
+
+def stream_completion(prompt: str, custom_max_tokens: int = None, responseJsonFormat: bool = False, llm_model: str = None, use_cache: bool = True, cache: ResponseCache = None, on_finish=None):
+    """Yield the completion text chunk by chunk as it arrives, raising on failure.
+
+    on_finish(complete) is called as for request_completion, once the stream has been read to the end.
+    """
+    request = build_request(prompt, custom_max_tokens, responseJsonFormat, llm_model)
+
+    if cache is None:
+        cache = get_response_cache()
+    cache_key = ResponseCache.make_key(**request, **cache_scope())
+    started = time.monotonic()
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            record_call(request['model'], started, cache='hit')
+            if on_finish is not None:
+                on_finish(True)
+            yield cached
+            return
+
+    cache_status = 'miss' if use_cache else 'off'
+
+    def open_stream(timeout):
+        attempt_started = time.monotonic()
+        try:
+            # The last chunk carries the token usage of the whole stream
+            return get_client().chat.completions.create(
+                **request, stream=True, stream_options={'include_usage': True}, timeout=timeout)
+        except Exception as e:
+            record_call(request['model'], attempt_started, cache=cache_status, error=e)
+            raise
+
+    # Only opening the stream is retried, text that was already yielded cannot be taken back. The
+    # concurrency slot stays taken until the stream is read to the end or closed.
+    stream, release_slot = call_with_retries(request['model'], open_stream, hold_slot=True)
+    parts = []
+    usage = None
+    finish_reason = None
+    first_token_at = None
+    error = None
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            if not chunk.choices:
+                continue
+            finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
+            delta = getattr(chunk.choices[0].delta, 'content', None)
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                parts.append(delta)
+                yield delta
+    except BaseException as e:
+        # Includes GeneratorExit when the consumer stops reading early, the tokens are billed anyway
+        error = e
+        raise
+    finally:
+        record_call(request['model'], started, usage, cache_status, error, first_token_at)
+        try:
+            if error is not None and hasattr(stream, 'close'):
+                # Drop the connection instead of leaving the rest of the answer unread
+                stream.close()
+        finally:
+            release_slot()
+
+    content = "".join(parts).strip()
+    complete = bool(content) and finish_reason == 'stop'
+    if on_finish is not None:
+        on_finish(complete)
+    if use_cache and complete:
+        cache.set(cache_key, content)
+
+
+def collect_stream(chunks, on_update, interval: float = 0.1) -> str:
+    """Join streamed chunks, reporting the text so far to on_update at most every interval seconds"""
+    text = ""
+    last_update = 0.0
+    for chunk in chunks:
+        text += chunk
+        now = time.monotonic()
+        if now - last_update >= interval:
+            on_update(text)
+            last_update = now
+    text = text.strip()
+    on_update(text)
+    return text
+
+
+def run_concurrently(fn, items, max_workers: int = None, on_result=None):
+    """Apply fn to every item on a bounded thread pool and return the results in input order.
+
+    on_result(index, result) is called on the calling thread as soon as each item finishes.
+    """
+    if not items:
+        return []
+
+    max_workers = min(max_workers or CONCURRENCY_CONFIG['max_workers'], len(items))
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Every call keeps the telemetry tags (call site, session, ...) of the caller
+        futures = {
+            executor.submit(contextvars.copy_context().run, fn, item): index
+            for index, item in enumerate(items)
+        }
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_result is not None:
+                    on_result(index, results[index])
+        except BaseException:
+            # Don't start calls whose results would be thrown away anyway
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+
+DOC_RULES = """
+    Rules:
+    1. IGNORE standard libraries (System.*, Microsoft.*, UiPath.*, mscorlib)
+    2. Write the documentation directly without any comments
+    3. Write the documentation in a clear and concise manner
+    4. Always adhere to the prompting from the user. If they want a change to the structure, content or anything else, you will implement it
+    5. Be detailed in the documentation, try not to be general, but go into detail related to the code.
+    """
+
+
+DOC_FORMAT_RULES = """
+    Format the documentation using proper Markdown syntax:
+       - Use # for main titles, ## for subtitles, ### for section headers
+       - Use * or - for bullet points
+       - Use **bold** and *italic* for emphasis
+       - Use proper headings hierarchy for better readability
+       - Use `code` formatting for property names, activities, or code references
+       - Use > for important notes or highlights
+       - Include horizontal rules (---) to separate major sections
+       - Use emojis where appropriate to enhance readability (📁, 🔄, ✅, etc.)
+    """
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def doc_section_key(xaml_file):
+    """Key a documentation section by file name and content so unchanged files are reused"""
+    return f"{xaml_file['name']}:{content_hash(xaml_file['content'])}"
+
+
+def shared_section_key(section_key, file_names, instruction=None):
+    """Key of a section in the process-wide cache: the prompt also depends on the project's file names, the model
+    and the user's instruction, if any"""
+    scope = cache_scope()
+    extra = [instruction] if instruction else []
+    return content_key(MODEL_CONFIG['model'], *scope.values(), section_key, *file_names, *extra)
+
+
+def instruction_rules(instruction):
+    """Prompt lines passing on what the user asked to change in the documentation"""
+    if not instruction:
+        return ""
+    return f"""
+    The user asked for the following change to the documentation, implement it:
+    {instruction}
+    """
+
+
+def complete_with_progress(prompt, on_progress=None, on_finish=None):
+    """Call the model, streaming the partial text to on_progress when it is given"""
+    if on_progress is None:
+        return request_completion(prompt, on_finish=on_finish)
+    return collect_stream(stream_completion(prompt, on_finish=on_finish), on_progress)
+
+
+def file_section_prompt(xaml_file, file_names, content, part=1, total_parts=1, instruction=None):
+    if total_parts == 1:
+        scope = f"Start with a \"## 📄 {xaml_file['name']}\" heading and use ### and lower for everything inside it."
+    else:
+        scope = (f"The file is too large for one request, this is part {part} of {total_parts}. "
+                 "Document only what is in this part and start directly with ### headings, the file heading is added later.")
+
+    return f"""
+    Create a comprehensive documentation for the UiPath workflow file `{xaml_file['name']}` that contains all informations should be not shortly.
+    It is one file of a project with these files: {', '.join(file_names)}
+    {DOC_RULES}
+    Focus on:
+       - Purpose of this workflow and its flow
+       - Business logic
+       - Dependencies and requirements
+       - Interactions with other files (invoked workflows, files read or written)
+       - Custom implementations
+       - Data flow
+       - Inputs/outputs
+       - Potential errors and exceptions (Should focus more on the details from code, not general suggestions. Should include also privacy issues when personal data is involved, like privacy-sensitive data in non-compliant ways)
+       - Possible improvements with priorities (Should focus more on the details from code, not general suggestions, also where it can be implemented, how it should be used and why)
+    {DOC_FORMAT_RULES}
+    {instruction_rules(instruction)}
+    {scope}
+
+    XAML content:
+    {content}
+    """
+
+
+def combine_parts_prompt(xaml_file, part_docs, instruction=None):
+    all_parts = "\n\n---\n\n".join(part_docs)
+
+    return f"""
+    Below is the documentation of the consecutive parts of the UiPath workflow file `{xaml_file['name']}`.
+    Combine them into one documentation of the whole file, keeping all details and removing repetitions.
+    {DOC_RULES}
+    {DOC_FORMAT_RULES}
+    {instruction_rules(instruction)}
+    Start with a "## 📄 {xaml_file['name']}" heading and use ### and lower for everything inside it.
+
+    Documentation of the parts:
+    {all_parts}
+    """
+
+
+def condense_prompt(texts):
+    all_texts = "\n\n---\n\n".join(texts)
+
+    return f"""
+    Condense the following UiPath workflow documentation into a shorter Markdown summary.
+    Keep every workflow and file name, arguments, invoked workflows, data flow, risks and improvement ideas, drop the prose.
+
+    Documentation:
+    {all_texts}
+    """
+
+
+def reduce_to_budget(texts, complete):
+    """Condense texts group by group until together they fit into a single reduce prompt"""
+    while len(texts) > 1 and sum(estimate_tokens(text) for text in texts) > DOC_BUDGET['reduce_tokens']:
+        groups = pack_texts(texts, DOC_BUDGET['reduce_tokens'])
+        if len(groups) == len(texts):
+            # Every text is large on its own, condense pairs so the number of texts keeps shrinking
+            groups = [texts[i:i + 2] for i in range(0, len(texts), 2)]
+        with telemetry_context(call_site='docs_condense'):
+            texts = run_concurrently(lambda group: complete(condense_prompt(group)), groups)
+    return texts
+
+
+def merge_doc_sections(sections, on_progress=None, complete=None, instruction=None):
+    """Write the project-level overview from already generated per-file sections"""
+    if complete is not None:
+        sections = reduce_to_budget(sections, complete)
+    all_sections = "\n\n---\n\n".join(sections)
+
+    prompt = f"""
+    Below is the documentation of each file of a UiPath project. Write the project-level part of the documentation that goes in front of it.
+    {DOC_RULES}
+    Focus on:
+       - Overall workflow purpose and flow across all files
+       - How the files interact and in which order they run
+       - Data flow between the files
+       - Inputs/outputs of the project as a whole
+       - Cross-file risks, errors and privacy issues
+       - Possible improvements for the whole project with priorities
+       - Conclusion
+    Do not repeat the per-file documentation, refer to the files by name instead.
+    {DOC_FORMAT_RULES}
+    {instruction_rules(instruction)}
+    Start directly with a "# Overview" section and continue with the rest of the content
+
+    Per-file documentation:
+    {all_sections}
+    """
+    with telemetry_context(call_site='docs_overview'):
+        return complete_with_progress(prompt, on_progress)
+
+
+def generate_combined_docs(xaml_files, section_cache=None, on_progress=None, instruction=None, instruction_files=None):
+    """Build project documentation from per-file sections, only documenting files whose content changed.
+
+    Files over DOC_BUDGET['chunk_tokens'] are split at activity boundaries, the parts are documented in
+    parallel and then combined into the file's section. When on_progress is given it is called with the
+    partially assembled documentation as it grows. An instruction (the user's request for a change to the
+    documentation) goes into the overview and rewrites the sections of the files at instruction_files,
+    or the only section of a single-file project.
+    """
+    if not xaml_files:
+        return ""
+
+    if section_cache is None:
+        section_cache = {}
+
+    separator = "\n\n---\n\n"
+    cache = get_response_cache()
+    complete = lambda prompt: request_completion(prompt, cache=cache)
+    file_names = [f['name'] for f in xaml_files]
+    keys = [doc_section_key(f) for f in xaml_files]
+
+    rewritten = set()
+    if instruction:
+        indices = [0] if len(keys) == 1 else instruction_files or []
+        rewritten = {keys[idx] for idx in indices if 0 <= idx < len(keys)}
+    for key in rewritten:
+        section_cache.pop(key, None)
+    section_instruction = lambda key: instruction if key in rewritten else None
+
+    # Sections documented by other sessions, jobs or batch runs for the same files are reused as they are,
+    # unless caching is switched off
+    shared_sections = get_cache('doc_sections') if CACHE_CONFIG['enabled'] else None
+    shared_keys = {key: shared_section_key(key, file_names, section_instruction(key)) for key in keys}
+    for key in keys:
+        if key not in section_cache and shared_sections is not None:
+            section = shared_sections.get(shared_keys[key])
+            if section is not None:
+                section_cache[key] = section
+    missing = [key for key in keys if key not in section_cache]
+
+    # Sections built from a truncated or empty answer are used, but not shared
+    incomplete = set()
+
+    def section_finished(key):
+        def on_finish(complete_answer):
+            if not complete_answer:
+                incomplete.add(key)
+        return on_finish
+
+    def complete_section(key):
+        return lambda prompt: request_completion(prompt, cache=cache, on_finish=section_finished(key))
+
+    def assemble(partial_key=None, partial=""):
+        return separator.join(
+            partial if key == partial_key else section_cache[key]
+            for key in keys if key == partial_key or key in section_cache
+        )
+
+    # Map: one prompt per changed file, or one per chunk for files over the token budget
+    jobs = []
+    for xaml_file, key in zip(xaml_files, keys):
+        if key in section_cache:
+            continue
+        compacted, _ = compact_xaml(xaml_file['content'])
+        chunks = split_xaml(compacted, DOC_BUDGET['chunk_tokens'])
+        for part, chunk in enumerate(chunks, 1):
+            jobs.append((xaml_file, key, file_section_prompt(xaml_file, file_names, chunk, part, len(chunks), section_instruction(key))))
+
+    if len(jobs) == 1 and on_progress is not None:
+        xaml_file, key, prompt = jobs[0]
+        with telemetry_context(call_site='docs_file'):
+            section_cache[key] = complete_with_progress(
+                prompt, lambda partial: on_progress(assemble(key, partial)), section_finished(key))
+    elif jobs:
+        parts_per_file = {}
+        for _, key, _ in jobs:
+            parts_per_file[key] = parts_per_file.get(key, 0) + 1
+
+        def show_finished_file(index, result):
+            _, key, _ = jobs[index]
+            if parts_per_file[key] == 1:
+                section_cache[key] = result
+                if on_progress is not None:
+                    on_progress(assemble())
+
+        with telemetry_context(call_site='docs_file'):
+            results = run_concurrently(lambda job: complete_section(job[1])(job[2]), jobs, on_result=show_finished_file)
+
+        # Reduce: combine the parts of every chunked file back into one section
+        part_docs = {}
+        split_files = {}
+        for (xaml_file, key, _), result in zip(jobs, results):
+            if parts_per_file[key] > 1:
+                part_docs.setdefault(key, []).append(result)
+                split_files[key] = xaml_file
+
+        with telemetry_context(call_site='docs_combine_parts'):
+            combined = run_concurrently(
+                lambda key: complete_section(key)(combine_parts_prompt(
+                    split_files[key], reduce_to_budget(part_docs[key], complete_section(key)), section_instruction(key))),
+                list(part_docs))
+        for key, section in zip(part_docs, combined):
+            section_cache[key] = section
+        if on_progress is not None and part_docs:
+            on_progress(assemble())
+
+    sections = [section_cache[key] for key in keys]
+    if shared_sections is not None:
+        for key in missing:
+            if key not in incomplete:
+                shared_sections.set(shared_keys[key], section_cache[key])
+
+    # Forget sections of files that were changed or removed
+    for key in list(section_cache):
+        if key not in keys:
+            del section_cache[key]
+
+    if len(sections) == 1:
+        return sections[0]
+
+    show_overview = None
+    if on_progress is not None:
+        show_overview = lambda partial: on_progress(separator.join([partial] + sections))
+    overview = merge_doc_sections(sections, show_overview, complete, instruction)
+    return separator.join([overview] + sections)
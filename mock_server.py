@@ -0,0 +1,296 @@
+"""OpenAI-compatible stand-in for the chat completions API, for benchmarks and load tests without a key.
+
+In-process, select it with LLM4REUSE_LLM_BACKEND=mock. Over HTTP, run
+
+    python mock_server.py --port 8700 --latency 0.5 --tokens-per-second 80
+
+and point the openai backend at it with OPENAI_BASE_URL=http://127.0.0.1:8700/v1. Answers are
+deterministic: routing and patch prompts get valid JSON, regeneration prompts get the original code
+back and everything else gets Markdown of doc_tokens tokens, unless a canned response matches first.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from xaml_chunking import estimate_tokens
+
+# Canned responses are a JSON list of {"match": "<regex on the prompt>", "response": "<text>"}
+MOCK_CONFIG = {
+    'latency_seconds': float(os.environ.get('LLM4REUSE_MOCK_LATENCY', 0.0)),
+    'tokens_per_second': float(os.environ.get('LLM4REUSE_MOCK_TOKENS_PER_SECOND', 0.0)),
+    'doc_tokens': 400,
+    'reasoning_tokens': 0,
+    'error_rate': float(os.environ.get('LLM4REUSE_MOCK_ERROR_RATE', 0.0)),
+    'seed': 0,
+    'responses_path': os.environ.get('LLM4REUSE_MOCK_RESPONSES')
+}
+
+WORDS = ("workflow", "activity", "sequence", "argument", "variable", "invoke", "assign", "selector",
+         "exception", "retry", "queue", "transaction", "orchestrator", "credential", "log", "output")
+DISPLAY_NAME = re.compile(r'DisplayName="([^"]*)"')
+CHUNK_TOKENS = 4
+
+
+class MockServerError(Exception):
+    """Injected failure, shaped like an API status error so the retry logic treats it as one"""
+
+    def __init__(self, status_code=500):
+        super().__init__(f"mock server error {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={})
+
+
+def load_canned_responses(path):
+    if not path:
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [(re.compile(entry['match'], re.DOTALL), entry['response']) for entry in json.load(f)]
+
+
+def _original_code(prompt):
+    _, marker, code = prompt.partition("Original code:")
+    return code.strip() if marker else None
+
+
+def _patch_answer(prompt):
+    """One edit that renames the first activity with a unique DisplayName, or no edits"""
+    code = _original_code(prompt) or ""
+    for match in DISPLAY_NAME.finditer(code):
+        if code.count(match.group(0)) == 1:
+            return json.dumps({'edits': [{'find': match.group(0), 'replace': f'DisplayName="{match.group(1)} (edited)"'}]})
+    return json.dumps({'edits': []})
+
+
+def _routing_answer(prompt):
+    user_request = prompt.partition("User's request:")[2].partition("JSON RESPONSE:")[0]
+    explain = "?" in user_request
+    return json.dumps({'modify_code': not explain, 'modify_docs': False, 'explain': explain, 'file_indices': [0]})
+
+
+def _documentation(prompt, tokens, rng):
+    title = re.search(r'workflow file `([^`]+)`', prompt)
+    lines = [f"# {title.group(1) if title else 'Overview'}", ""]
+    words = 0
+    while words < tokens:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(12))
+        lines.append(f"- {sentence.capitalize()}.")
+        words += 12
+    return "\n".join(lines)
+
+
+class MockModel:
+    """Produces the answer, the usage and the pacing of one mocked completion"""
+
+    def __init__(self, config=None):
+        self.config = dict(MOCK_CONFIG, **(config or {}))
+        self.canned = load_canned_responses(self.config['responses_path'])
+        self._rng = random.Random(self.config['seed'])
+        self._lock = threading.Lock()
+
+    def answer(self, request):
+        prompt = "\n".join(message['content'] for message in request['messages'])
+        for pattern, response in self.canned:
+            if pattern.search(prompt):
+                return prompt, response
+
+        json_mode = (request.get('response_format') or {}).get('type') == 'json_object'
+        if json_mode and "Do not return the whole file" in prompt:
+            return prompt, _patch_answer(prompt)
+        if json_mode:
+            return prompt, _routing_answer(prompt)
+        if "Return only the complete modified XAML code" in prompt:
+            return prompt, _original_code(prompt)
+        # Seeded by the prompt, so the same prompt gets the same answer however requests interleave
+        rng = random.Random(f"{self.config['seed']}:{prompt}")
+        return prompt, _documentation(prompt, self.config['doc_tokens'], rng)
+
+    def check_failure(self):
+        with self._lock:
+            failed = self._rng.random() < self.config['error_rate']
+        if failed:
+            raise MockServerError(500)
+
+    def usage(self, prompt, text):
+        return {
+            'prompt_tokens': estimate_tokens(prompt),
+            'completion_tokens': estimate_tokens(text) + self.config['reasoning_tokens'],
+            'total_tokens': estimate_tokens(prompt) + estimate_tokens(text) + self.config['reasoning_tokens'],
+            'prompt_tokens_details': {'cached_tokens': 0},
+            'completion_tokens_details': {'reasoning_tokens': self.config['reasoning_tokens']}
+        }
+
+    def chunks(self, text):
+        """Split text into pieces of about CHUNK_TOKENS tokens, sleeping to match tokens_per_second"""
+        if self.config['latency_seconds']:
+            time.sleep(self.config['latency_seconds'])
+        step = CHUNK_TOKENS * 4
+        for start in range(0, len(text), step):
+            if self.config['tokens_per_second']:
+                time.sleep(CHUNK_TOKENS / self.config['tokens_per_second'])
+            yield text[start:start + step]
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def completion_payload(request, text, usage):
+    return {
+        'id': f"chatcmpl-mock-{uuid.uuid4().hex}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': request['model'],
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+        'usage': usage
+    }
+
+
+def chunk_payload(request, completion_id, delta=None, usage=None, finish_reason=None):
+    if finish_reason is not None:
+        choices = [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}]
+    else:
+        choices = [] if delta is None else [{'index': 0, 'delta': {'content': delta}, 'finish_reason': None}]
+    return {
+        'id': completion_id,
+        'object': 'chat.completion.chunk',
+        'created': int(time.time()),
+        'model': request['model'],
+        'choices': choices,
+        'usage': usage
+    }
+
+
+class _MockCompletions:
+    def __init__(self, model):
+        self._model = model
+
+    def create(self, stream=False, stream_options=None, timeout=None, **request):
+        self._model.check_failure()
+        prompt, text = self._model.answer(request)
+        usage = self._model.usage(prompt, text)
+        if not stream:
+            for _ in self._model.chunks(text):
+                pass
+            return _namespace(completion_payload(request, text, usage))
+        return self._stream(request, text, usage, (stream_options or {}).get('include_usage'))
+
+    def _stream(self, request, text, usage, include_usage):
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex}"
+        for delta in self._model.chunks(text):
+            yield _namespace(chunk_payload(request, completion_id, delta))
+        yield _namespace(chunk_payload(request, completion_id, finish_reason='stop'))
+        if include_usage:
+            yield _namespace(chunk_payload(request, completion_id, usage=usage))
+
+
+class MockClient:
+    """Duck-typed replacement for openai.OpenAI: client.chat.completions.create(...)"""
+
+    def __init__(self, config=None):
+        self.model = MockModel(config)
+        self.chat = SimpleNamespace(completions=_MockCompletions(self.model))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "LLM4ReuseMock"
+    model = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]})
+        else:
+            self._send_json(404, {'error': {'message': "not found"}})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        try:
+            self.model.check_failure()
+        except MockServerError as e:
+            self._send_json(e.status_code, {'error': {'message': str(e), 'type': 'server_error'}})
+            return
+
+        prompt, text = self.model.answer(request)
+        usage = self.model.usage(prompt, text)
+        if not request.get('stream'):
+            for _ in self.model.chunks(text):
+                pass
+            self._send_json(200, completion_payload(request, text, usage))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex}"
+        for delta in self.model.chunks(text):
+            self._send_event(chunk_payload(request, completion_id, delta))
+        self._send_event(chunk_payload(request, completion_id, finish_reason='stop'))
+        if (request.get('stream_options') or {}).get('include_usage'):
+            self._send_event(chunk_payload(request, completion_id, usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+def create_server(host='127.0.0.1', port=8700, config=None):
+    handler = type('Handler', (MockHandler,), {'model': MockModel(config)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an OpenAI-compatible mock of the chat completions API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--latency', type=float, default=MOCK_CONFIG['latency_seconds'], help="seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=MOCK_CONFIG['tokens_per_second'], help="0 for no limit")
+    parser.add_argument('--doc-tokens', type=int, default=MOCK_CONFIG['doc_tokens'], help="length of generated documentation")
+    parser.add_argument('--error-rate', type=float, default=MOCK_CONFIG['error_rate'], help="fraction of requests answered with a 500")
+    parser.add_argument('--responses', default=MOCK_CONFIG['responses_path'], help="JSON file with canned responses")
+    parser.add_argument('--seed', type=int, default=MOCK_CONFIG['seed'])
+    args = parser.parse_args(argv)
+
+    server = create_server(args.host, args.port, {
+        'latency_seconds': args.latency,
+        'tokens_per_second': args.tokens_per_second,
+        'doc_tokens': args.doc_tokens,
+        'error_rate': args.error_rate,
+        'responses_path': args.responses,
+        'seed': args.seed
+    })
+    print(f"Mock chat completions API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
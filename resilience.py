@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from telemetry import context as telemetry_context
+
+# Limits are per model and shared by every session, job and thread of the process
+RESILIENCE_CONFIG = {
+    'max_retries': 5,
+    'initial_backoff': 2.0,
+    'max_backoff': 60.0,
+    'models': {
+        'gpt-5': {'concurrency': 8, 'requests_per_minute': 500, 'timeout_seconds': 600},
+        'gpt-4o-mini': {'concurrency': 16, 'requests_per_minute': 1000, 'timeout_seconds': 60}
+    },
+    'default_model': {'concurrency': 8, 'requests_per_minute': 500, 'timeout_seconds': 300},
+    # Consecutive server errors or timeouts that open the circuit, and how long it stays open
+    'failure_threshold': 5,
+    'reset_seconds': 30.0
+}
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model that failed repeatedly, until its reset time has passed"""
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection problems and server errors are worth another attempt"""
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return status_code is not None and (status_code in RETRYABLE_STATUS_CODES or status_code >= 500)
+
+
+def is_rate_limit(error):
+    return getattr(error, 'status_code', None) == 429
+
+
+def retry_after_seconds(error):
+    """The delay the server asked for in its Retry-After (or retry-after-ms) header, None if there is none"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return None
+
+
+def get_backoff_delay(error, attempt):
+    """Seconds to wait before retrying, preferring the server's Retry-After header"""
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        return min(retry_after, RESILIENCE_CONFIG['max_backoff'])
+    delay = RESILIENCE_CONFIG['initial_backoff'] * (2 ** attempt)
+    return min(delay, RESILIENCE_CONFIG['max_backoff']) * random.uniform(0.5, 1.0)
+
+
+class RateLimiter:
+    """Token bucket allowing requests_per_minute calls, with short bursts up to a tenth of that"""
+
+    def __init__(self, requests_per_minute):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, requests_per_minute / 10.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Hold back every caller, e.g. after the server answered with a rate limit error"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stops calling a model after failure_threshold consecutive failures.
+
+    After reset_seconds a single trial call is let through: success closes the circuit again, another
+    failure keeps it open for the next reset_seconds.
+    """
+
+    def __init__(self, name, failure_threshold, reset_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.trial_running:
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable after {self.failures} failed calls in a row, "
+                    f"retry in {max(remaining, 1):.0f}s")
+            self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def release_trial(self):
+        """Let another trial through when the trial call ended without a verdict (e.g. a client error)"""
+        with self._lock:
+            self.trial_running = False
+
+
+class ModelGate:
+    """Concurrency limit, rate limiter and circuit breaker of one model"""
+
+    def __init__(self, model, limits):
+        self.model = model
+        self.timeout = limits['timeout_seconds']
+        self.limiter = RateLimiter(limits['requests_per_minute'])
+        self.breaker = CircuitBreaker(model, RESILIENCE_CONFIG['failure_threshold'], RESILIENCE_CONFIG['reset_seconds'])
+        self._slots = threading.BoundedSemaphore(limits['concurrency'])
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @contextmanager
+    def slot(self):
+        """Wait for the rate limiter and a free concurrency slot, held for the whole call"""
+        self.limiter.acquire()
+        with self._slots:
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def stats(self):
+        return {'state': self.breaker.state, 'failures': self.breaker.failures, 'in_flight': self.in_flight}
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(model):
+    with _gates_lock:
+        if model not in _gates:
+            limits = next((limits for name, limits in RESILIENCE_CONFIG['models'].items() if model.startswith(name)),
+                          RESILIENCE_CONFIG['default_model'])
+            _gates[model] = ModelGate(model, limits)
+        return _gates[model]
+
+
+def call_with_retries(model, fn, hold_slot=False):
+    """Run fn(timeout) for one API call of model, within its limits and retrying transient failures.
+
+    fn must do exactly one request; it is called again for every retry, each time tagged with the
+    attempt number for telemetry. Errors that are not transient are raised right away.
+
+    With hold_slot the concurrency slot stays taken after fn succeeded and (result, release) is
+    returned, for responses such as streams that keep the connection busy; call release() once done.
+    """
+    gate = get_gate(model)
+    for attempt in range(RESILIENCE_CONFIG['max_retries'] + 1):
+        gate.breaker.before_call()
+        slot = ExitStack()
+        try:
+            slot.enter_context(gate.slot())
+            try:
+                with telemetry_context(attempt=attempt):
+                    result = fn(gate.timeout)
+            except BaseException:
+                slot.close()
+                raise
+            if not hold_slot:
+                slot.close()
+        except Exception as e:
+            if not is_retryable(e):
+                gate.breaker.release_trial()
+                raise
+            delay = get_backoff_delay(e, attempt)
+            if is_rate_limit(e):
+                # Rate limits say nothing about the model's health, but everyone should slow down
+                gate.breaker.release_trial()
+                gate.limiter.pause(delay)
+            else:
+                gate.breaker.record_failure()
+            if attempt == RESILIENCE_CONFIG['max_retries']:
+                raise
+            time.sleep(delay)
+        else:
+            gate.breaker.record_success()
+            return (result, slot.close) if hold_slot else result
+
+
+def resilience_stats():
+    with _gates_lock:
+        gates = dict(_gates)
+    return {model: gate.stats() for model, gate in gates.items()}
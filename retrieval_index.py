@@ -0,0 +1,233 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from lxml import etree
+from xaml_chunking import estimate_tokens
+from xaml_visualizer import parse_xaml_cached
+
+INDEX_CACHE_SIZE = 32
+XAML_NAMESPACE = "http://schemas.microsoft.com/winfx/2006/xaml"
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+
+_snippet_cache = OrderedDict()
+_index_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Lowercase words plus their camelCase/snake_case parts, so 'in_FilePath' also matches 'file path'"""
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        tokens.append(word.lower())
+        parts = SUBWORD_PATTERN.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def _label(node):
+    name = node.get('nodeName', 'Unknown')
+    display_name = node.get('displayName')
+    return f'{name} "{display_name}"' if display_name else name
+
+
+def _activity_text(node):
+    lines = []
+    for arg in node.get('mainArgs', []) + node.get('attributes', []):
+        lines.append(f"{arg.get('name')}: {arg.get('value')}")
+    if node.get('annotation'):
+        lines.append(f"Annotation: {node.get('annotation')}")
+    if node.get('inArgs'):
+        lines.append(f"In arguments: {', '.join(node.get('inArgs'))}")
+    if node.get('outArgs'):
+        lines.append(f"Out arguments: {', '.join(node.get('outArgs'))}")
+    return "\n".join(lines)
+
+
+def _activity_snippets(file_name, tree):
+    snippets = []
+    stack = [(tree, "")]
+    while stack:
+        node, path = stack.pop()
+        label = _label(node)
+        # Containers like If.Then carry no information of their own
+        if node.get('displayName') or _activity_text(node):
+            snippets.append({
+                'file': file_name,
+                'kind': 'activity',
+                'title': f"{path} > {label}" if path else label,
+                'text': _activity_text(node)
+            })
+        child_path = f"{path} > {label}" if path else label
+        for child in reversed(node.get('children', [])):
+            stack.append((child, child_path))
+    return snippets
+
+
+def _declaration_snippets(file_name, xaml_content):
+    """Workflow arguments (x:Property) and variables, which the activity tree does not contain"""
+    try:
+        root = etree.fromstring(xaml_content.encode('utf-8'), etree.XMLParser(huge_tree=True))
+    except (etree.XMLSyntaxError, ValueError):
+        return []
+
+    snippets = []
+    for element in root.iter(f"{{{XAML_NAMESPACE}}}Property"):
+        snippets.append({
+            'file': file_name,
+            'kind': 'argument',
+            'title': f"Argument {element.get('Name')}",
+            'text': f"Type: {element.get('Type')}"
+        })
+    for element in root.iter(tag=etree.Element):
+        if element.tag.split('}')[-1] != 'Variable':
+            continue
+        scope = element.getparent().getparent() if element.getparent() is not None else None
+        scope_name = scope.get('DisplayName') if scope is not None else None
+        text = [f"Type: {element.get(f'{{{XAML_NAMESPACE}}}TypeArguments')}"]
+        if element.get('Default'):
+            text.append(f"Default: {element.get('Default')}")
+        if scope_name:
+            text.append(f"Scope: {scope_name}")
+        snippets.append({
+            'file': file_name,
+            'kind': 'variable',
+            'title': f"Variable {element.get('Name')}",
+            'text': "\n".join(text)
+        })
+    return snippets
+
+
+def xaml_snippets(file_name, xaml_content):
+    """Split one XAML file into searchable snippets: one per activity, argument and variable"""
+    key = (file_name, hashlib.sha256(xaml_content.encode('utf-8')).hexdigest())
+    with _cache_lock:
+        if key in _snippet_cache:
+            _snippet_cache.move_to_end(key)
+            return _snippet_cache[key]
+
+    tree = parse_xaml_cached(xaml_content)
+    snippets = _declaration_snippets(file_name, xaml_content)
+    if 'error' not in tree:
+        snippets += _activity_snippets(file_name, tree)
+
+    with _cache_lock:
+        _snippet_cache[key] = snippets
+        while len(_snippet_cache) > INDEX_CACHE_SIZE * 4:
+            _snippet_cache.popitem(last=False)
+    return snippets
+
+
+def documentation_snippets(documentation):
+    """One snippet per Markdown section of the documentation"""
+    snippets = []
+    title, lines = None, []
+    for line in documentation.splitlines():
+        if HEADING_PATTERN.match(line):
+            if title or any(l.strip() for l in lines):
+                snippets.append({'file': None, 'kind': 'documentation', 'title': title or "Documentation", 'text': "\n".join(lines).strip()})
+            title, lines = line.lstrip('#').strip(), []
+        else:
+            lines.append(line)
+    if title or any(l.strip() for l in lines):
+        snippets.append({'file': None, 'kind': 'documentation', 'title': title or "Documentation", 'text': "\n".join(lines).strip()})
+    return snippets
+
+
+class BM25Index:
+    """Okapi BM25 over snippets, built in memory on every content change"""
+
+    def __init__(self, snippets, k1=1.5, b=0.75):
+        self.snippets = snippets
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._lengths = []
+        for index, snippet in enumerate(snippets):
+            terms = Counter(tokenize(f"{snippet['title']}\n{snippet['text']}"))
+            self._lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self._postings.setdefault(term, []).append((index, count))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0
+
+    def search(self, query, top_k=10, files=None):
+        """Return up to top_k (score, snippet) pairs, optionally only from the given files (plus documentation)"""
+        scores = Counter()
+        total = len(self.snippets)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / self._average_length)
+                scores[index] += idf * count * (self.k1 + 1) / (count + norm)
+
+        results = []
+        for index, score in scores.most_common():
+            snippet = self.snippets[index]
+            if files is not None and snippet['file'] is not None and snippet['file'] not in files:
+                continue
+            results.append((score, snippet))
+            if len(results) >= top_k:
+                break
+        return results
+
+
+def build_index(files, documentation):
+    """Index the activities, arguments and variables of every file plus the documentation sections"""
+    key = (
+        tuple((f['name'], hashlib.sha256(f['content'].encode('utf-8')).hexdigest()) for f in files),
+        hashlib.sha256(documentation.encode('utf-8')).hexdigest()
+    )
+    with _cache_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+    snippets = documentation_snippets(documentation)
+    for xaml_file in files:
+        snippets += xaml_snippets(xaml_file['name'], xaml_file['content'])
+    index = BM25Index(snippets)
+
+    with _cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def format_snippet(snippet):
+    source = f"[{snippet['file']}] " if snippet['file'] else "[Documentation] "
+    body = f"\n{snippet['text']}" if snippet['text'] else ""
+    return f"{source}{snippet['title']}{body}"
+
+
+def retrieve_context(index, query, max_tokens, top_k=20, files=None):
+    """Format the best matching snippets for a prompt, stopping at max_tokens.
+
+    The first documentation section (the project overview) always goes first, so broad questions
+    that match few terms still get a useful answer.
+    """
+    selected = []
+    overview = next((s for s in index.snippets if s['kind'] == 'documentation'), None)
+    if overview:
+        selected.append(overview)
+    for _, snippet in index.search(query, top_k, files):
+        if snippet is not overview:
+            selected.append(snippet)
+
+    parts = []
+    used_tokens = 0
+    for snippet in selected:
+        text = format_snippet(snippet)
+        tokens = estimate_tokens(text)
+        if parts and used_tokens + tokens > max_tokens:
+            continue
+        parts.append(text)
+        used_tokens += tokens
+    return "\n\n".join(parts)
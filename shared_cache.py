@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+# Memory budget per cache; the disk tier is off unless LLM4REUSE_SHARED_CACHE_DIR is set
+SHARED_CACHE_CONFIG = {
+    'max_bytes': {
+        'visualizations': 64 * 1024 * 1024,
+        'parsed_trees': 64 * 1024 * 1024,
+        'doc_sections': 32 * 1024 * 1024
+    },
+    'default_max_bytes': 32 * 1024 * 1024,
+    'disk_dir': os.environ.get('LLM4REUSE_SHARED_CACHE_DIR'),
+    'max_disk_bytes': 512 * 1024 * 1024
+}
+
+
+def content_key(*parts):
+    """Hash strings (file contents, names, options) into one cache key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _encoded_size(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError, RecursionError):
+        return None
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total (encoded) size of its values in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size=None):
+        value_size = _encoded_size(value) if size is None else size
+        if value_size is None or value_size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, value_size)
+            self.size += value_size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+class DiskStore:
+    """zlib-compressed JSON files named by key, oldest-accessed files are deleted over max_bytes"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.json.z'))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.z")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = json.loads(zlib.decompress(f.read()))
+            os.utime(path)
+            return value
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def set(self, key, value):
+        try:
+            data = zlib.compress(json.dumps(value).encode('utf-8'))
+        except (TypeError, ValueError, RecursionError):
+            # Not JSON-serializable (or nested too deeply for the encoder), keep it in memory only
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                # Disk full, read-only or removed directory: the value stays in memory only
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                return
+            self.size += len(data) - previous
+            if self.size > self.max_bytes:
+                self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json.z')),
+            key=lambda entry: entry.stat().st_mtime)
+        self.size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.size -= size
+            except OSError:
+                pass
+
+
+class SharedCache:
+    """Process-wide cache keyed by content hash, shared by every session, job and thread.
+
+    Values must be JSON-serializable when a disk tier is configured. get_or_compute makes concurrent
+    callers asking for the same key wait for one computation instead of repeating it.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, max_disk_bytes=0):
+        self.memory = LRUCache(max_bytes)
+        self.disk = DiskStore(disk_dir, max_disk_bytes) if disk_dir else None
+        self.disk_hits = 0
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value, size=None):
+        self.memory.set(key, value, size)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_compute(self, key, compute, size=None):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            value = self.get(key)
+            if value is not None:
+                return value
+            # The computation failed or its result was too large to keep, do it ourselves
+            return compute()
+
+        try:
+            value = compute()
+            self.set(key, value, size)
+            return value
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            event.set()
+
+    def stats(self):
+        stats = dict(self.memory.stats(), disk_hits=self.disk_hits)
+        if self.disk is not None:
+            stats['disk_bytes'] = self.disk.size
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name):
+    """The process-wide SharedCache for one kind of value ('visualizations', 'parsed_trees', 'doc_sections', ...)"""
+    with _caches_lock:
+        if name not in _caches:
+            disk_dir = SHARED_CACHE_CONFIG['disk_dir']
+            _caches[name] = SharedCache(
+                SHARED_CACHE_CONFIG['max_bytes'].get(name, SHARED_CACHE_CONFIG['default_max_bytes']),
+                os.path.join(disk_dir, name) if disk_dir else None,
+                SHARED_CACHE_CONFIG['max_disk_bytes'])
+        return _caches[name]
+
+
+def cache_stats():
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,212 @@
+"""Per-call metrics for every model request: call site, model, tokens, latency, retries and cache status.
+
+Every call is appended as one JSON line to TELEMETRY_CONFIG['path'] and kept in memory for the
+session panel. An aggregate report over the log file is printed with
+
+    python telemetry.py [--since-hours 24] [--by call_site|model|session|project]
+"""
+import argparse
+import collections
+import contextlib
+import contextvars
+import datetime
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Prices are USD per million tokens; update them when the price list changes
+TELEMETRY_CONFIG = {
+    'enabled': not os.environ.get('LLM4REUSE_DISABLE_TELEMETRY'),
+    'path': os.environ.get('LLM4REUSE_TELEMETRY_PATH', os.path.join(BASE_DIR, ".llm_cache", "telemetry.jsonl")),
+    'recent_events': 10000,
+    'prices': {
+        'gpt-5': {'input': 1.25, 'cached_input': 0.125, 'output': 10.0},
+        'gpt-4o-mini': {'input': 0.15, 'cached_input': 0.075, 'output': 0.6}
+    }
+}
+
+# Tags (call_site, session, job, project, attempt) attached to the calls made inside a context()
+_tags = contextvars.ContextVar('llm_telemetry_tags', default={})
+_recent = collections.deque(maxlen=TELEMETRY_CONFIG['recent_events'])
+_sink_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def context(**tags):
+    """Tag every model call made inside the block, e.g. with context(call_site='modify')"""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags():
+    return dict(_tags.get())
+
+
+def usage_fields(usage):
+    """Token counts from the usage block of a response, zero for anything the response did not report"""
+    if usage is None:
+        return {'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'reasoning_tokens': 0}
+    prompt_details = getattr(usage, 'prompt_tokens_details', None)
+    completion_details = getattr(usage, 'completion_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'cached_tokens': getattr(prompt_details, 'cached_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'reasoning_tokens': getattr(completion_details, 'reasoning_tokens', 0) or 0
+    }
+
+
+def estimate_cost(model, tokens):
+    """Cost of a call in USD, None for models without a configured price"""
+    prices = next((price for name, price in TELEMETRY_CONFIG['prices'].items() if model.startswith(name)), None)
+    if prices is None:
+        return None
+    uncached = tokens['prompt_tokens'] - tokens['cached_tokens']
+    # Reasoning tokens are billed as output tokens and already included in completion_tokens
+    return round((uncached * prices['input'] + tokens['cached_tokens'] * prices['cached_input']
+                  + tokens['completion_tokens'] * prices['output']) / 1_000_000, 6)
+
+
+def record_call(model, started, usage=None, cache='miss', error=None, first_token_at=None):
+    """Record one model call that began at time.monotonic() == started.
+
+    cache is 'hit', 'miss' or 'off'; error is the exception the call failed with, if any.
+    """
+    if not TELEMETRY_CONFIG['enabled']:
+        return None
+    now = time.monotonic()
+    tags = current_tags()
+    tokens = usage_fields(usage)
+    event = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'call_site': tags.pop('call_site', 'other'),
+        'model': model,
+        'status': 'error' if error is not None else 'ok',
+        'error': type(error).__name__ if error is not None else None,
+        'cache': cache,
+        'attempt': tags.pop('attempt', 0),
+        'seconds': round(now - started, 4),
+        'first_token_seconds': round(first_token_at - started, 4) if first_token_at is not None else None,
+        **tokens,
+        'cost_usd': 0.0 if cache == 'hit' else estimate_cost(model, tokens),
+        **tags
+    }
+    _recent.append(event)
+    _write(event)
+    return event
+
+
+def _write(event):
+    path = TELEMETRY_CONFIG['path']
+    if not path:
+        return
+    line = json.dumps(event, default=str) + "\n"
+    with _sink_lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            # Metrics must never break a model call
+            pass
+
+
+def recent_events(**tags):
+    """Calls recorded by this process that carry all the given tags, e.g. recent_events(session=...)"""
+    return [event for event in list(_recent) if all(event.get(key) == value for key, value in tags.items())]
+
+
+def read_events(path=None, since=None):
+    """Calls from the JSONL log, optionally only those recorded at or after the datetime since"""
+    path = path or TELEMETRY_CONFIG['path']
+    events = []
+    if not os.path.exists(path):
+        return events
+    cutoff = since.isoformat(timespec='milliseconds') if since else None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if cutoff is None or event.get('timestamp', '') >= cutoff:
+                events.append(event)
+    return events
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(events, by='call_site'):
+    """Aggregate calls per value of the field by: counts, tokens, cost and latency of the uncached calls"""
+    groups = {}
+    for event in events:
+        groups.setdefault(str(event.get(by) or '-'), []).append(event)
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        latencies = [event['seconds'] for event in group if event['cache'] != 'hit' and event['status'] == 'ok']
+        costs = [event['cost_usd'] for event in group if event.get('cost_usd') is not None]
+        summary[name] = {
+            'calls': len(group),
+            'errors': sum(event['status'] == 'error' for event in group),
+            'retries': sum(event.get('attempt', 0) > 0 for event in group),
+            'cache_hits': sum(event['cache'] == 'hit' for event in group),
+            'prompt_tokens': sum(event['prompt_tokens'] for event in group),
+            'completion_tokens': sum(event['completion_tokens'] for event in group),
+            'reasoning_tokens': sum(event['reasoning_tokens'] for event in group),
+            'cost_usd': round(sum(costs), 4),
+            'seconds_total': round(sum(latencies), 2),
+            'seconds_mean': round(statistics.mean(latencies), 2) if latencies else None,
+            'seconds_p95': round(_percentile(latencies, 0.95), 2) if latencies else None
+        }
+    return summary
+
+
+def format_report(summary):
+    columns = ['calls', 'errors', 'retries', 'cache_hits', 'prompt_tokens', 'completion_tokens',
+               'reasoning_tokens', 'cost_usd', 'seconds_total', 'seconds_mean', 'seconds_p95']
+    rows = [[name] + ["-" if values[column] is None else str(values[column]) for column in columns]
+            for name, values in summary.items()]
+    header = ['group'] + columns
+    widths = [max(len(row[index]) for row in rows + [header]) for index in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(header, widths))]
+    lines += ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the recorded model calls.")
+    parser.add_argument('path', nargs='?', help=f"telemetry log (default: {TELEMETRY_CONFIG['path']})")
+    parser.add_argument('--since-hours', type=float, help="only calls from the last N hours")
+    parser.add_argument('--by', default='call_site', help="field to group by: call_site, model, session, job, project, ...")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    since = datetime.datetime.now() - datetime.timedelta(hours=args.since_hours) if args.since_hours else None
+    events = read_events(args.path, since)
+    if not events:
+        print("No calls recorded", file=sys.stderr)
+        return 1
+
+    summary = summarize(events, args.by)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_report(summary))
+        print(f"\n{len(events)} calls, {sum(event.get('cost_usd') or 0 for event in events):.4f} USD")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+
+@pytest.fixture
+def sample_xaml():
+    """A small workflow with ViewState, designer attributes, an annotation and a base64 image"""
+    with open(os.path.join(TESTS_DIR, "sample.xaml"), encoding='utf-8') as f:
+        return f.read()
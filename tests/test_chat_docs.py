@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+
+import llm_service
+import workflow_service
+
+FILE_PROMPT = "Create a comprehensive documentation for the UiPath workflow file"
+OVERVIEW_PROMPT = "Write the project-level part of the documentation"
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Answers every documentation prompt with a short text, recording the prompts"""
+    prompts = []
+
+    def request_completion(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return f"answer {len(prompts)}"
+
+    def stream_completion(prompt, *args, **kwargs):
+        yield request_completion(prompt)
+
+    monkeypatch.setattr(llm_service, 'request_completion', request_completion)
+    monkeypatch.setattr(llm_service, 'stream_completion', stream_completion)
+    monkeypatch.setattr(llm_service, 'get_response_cache', lambda: None)
+    return prompts
+
+
+@pytest.fixture
+def project(model):
+    # Unique contents, so no section comes from the process-wide cache of another test
+    marker = uuid.uuid4().hex
+    files = [
+        {'name': 'Main.xaml', 'content': f'<Sequence DisplayName="Main {marker}" />'},
+        {'name': 'Other.xaml', 'content': f'<Sequence DisplayName="Other {marker}" />'},
+    ]
+    doc_sections = {}
+    documentation = llm_service.generate_combined_docs(files, doc_sections)
+    model.clear()
+    return files, documentation, doc_sections
+
+
+def chat(monkeypatch, project, user_input, analysis):
+    files, documentation, doc_sections = project
+    monkeypatch.setattr(workflow_service, 'analyze_request', lambda *args: dict(analysis))
+    monkeypatch.setattr(workflow_service, 'modify_files', lambda files, indices, *args: {
+        idx: files[idx]['content'].replace('/>', 'Comment="edited" />') for idx in indices})
+    return workflow_service.process_chat_message(files, documentation, doc_sections, user_input)
+
+
+def file_prompts(prompts):
+    return [prompt for prompt in prompts if FILE_PROMPT in prompt]
+
+
+def test_code_edit_redocuments_only_the_edited_file(monkeypatch, project, model):
+    result = chat(monkeypatch, project, "Add a log message to Main.xaml",
+                  {'modify_code': True, 'modify_docs': True, 'explain': False, 'file_indices': [0]})
+
+    [prompt] = file_prompts(model)
+    assert "`Main.xaml`" in prompt
+    assert "Add a log message" not in "".join(model)
+    assert result['changed']
+
+
+def test_docs_request_rewrites_the_named_file_and_the_overview(monkeypatch, project, model):
+    result = chat(monkeypatch, project, "Have the docs of Other.xaml list every argument",
+                  {'modify_code': False, 'modify_docs': True, 'explain': False, 'file_indices': [1]})
+
+    [prompt] = file_prompts(model)
+    assert "`Other.xaml`" in prompt
+    assert "list every argument" in prompt
+    [overview] = [prompt for prompt in model if OVERVIEW_PROMPT in prompt]
+    assert "list every argument" in overview
+    assert result['messages'] == ["Documentation has been updated."]
+
+
+def test_docs_request_without_files_only_rewrites_the_overview(monkeypatch, project, model):
+    chat(monkeypatch, project, "Do not use emojis in the documentation",
+         {'modify_code': False, 'modify_docs': True, 'explain': False, 'file_indices': []})
+
+    assert file_prompts(model) == []
+    assert len(model) == 1 and "Do not use emojis" in model[0]
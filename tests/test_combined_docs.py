@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+
+import llm_service
+from shared_cache import get_cache
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Answers every prompt, finishing with 'stop' unless model['complete'] is set to False"""
+    calls = {'prompts': [], 'complete': True}
+
+    def request_completion(prompt, *args, on_finish=None, **kwargs):
+        calls['prompts'].append(prompt)
+        if on_finish is not None:
+            on_finish(calls['complete'])
+        return f"answer {len(calls['prompts'])}"
+
+    monkeypatch.setattr(llm_service, 'request_completion', request_completion)
+    monkeypatch.setattr(llm_service, 'get_response_cache', lambda: None)
+    return calls
+
+
+@pytest.fixture
+def files():
+    # Unique contents, so no section comes from the process-wide cache of another test
+    marker = uuid.uuid4().hex
+    return [
+        {'name': 'Main.xaml', 'content': f'<Sequence DisplayName="Main {marker}" />'},
+        {'name': 'Other.xaml', 'content': f'<Sequence DisplayName="Other {marker}" />'},
+    ]
+
+
+def shared_section(files, index):
+    key = llm_service.doc_section_key(files[index])
+    return get_cache('doc_sections').get(llm_service.shared_section_key(key, [f['name'] for f in files]))
+
+
+def test_complete_sections_are_shared(model, files):
+    llm_service.generate_combined_docs(files)
+    assert shared_section(files, 0) is not None
+
+    model['prompts'].clear()
+    llm_service.generate_combined_docs(files)
+    assert len(model['prompts']) == 1  # only the overview
+
+
+def test_truncated_sections_are_not_shared(model, files):
+    model['complete'] = False
+    llm_service.generate_combined_docs(files)
+
+    assert shared_section(files, 0) is None
+    assert shared_section(files, 1) is None
+
+
+def test_shared_sections_are_not_used_with_caching_disabled(model, files, monkeypatch):
+    llm_service.generate_combined_docs(files)
+    monkeypatch.setitem(llm_service.CACHE_CONFIG, 'enabled', False)
+
+    model['prompts'].clear()
+    llm_service.generate_combined_docs(files)
+
+    assert len(model['prompts']) == 3
@@ -0,0 +1,70 @@
+from diff_engine import diff_trees, structural_diff
+
+
+def node(name, display_name=None, children=(), **attributes):
+    return {
+        'nodeName': name,
+        'displayName': display_name,
+        'attributes': [{'name': key, 'value': value} for key, value in attributes.items()],
+        'children': list(children)
+    }
+
+
+def tree(*children, display_name="Main"):
+    return node('Sequence', display_name, children)
+
+
+def test_identical_trees_have_no_changes():
+    assert diff_trees(tree(node('Assign', "Set a")), tree(node('Assign', "Set a"))) == []
+
+
+def test_changed_property():
+    old = tree(node('Assign', "Set a", To="[a]"))
+    new = tree(node('Assign', "Set a", To="[b]"))
+    assert diff_trees(old, new) == [
+        {'op': 'changed', 'path': 'Sequence "Main"', 'activity': 'Assign "Set a"', 'details': ['To: [a] → [b]']}
+    ]
+
+
+def test_added_and_removed_children():
+    old = tree(node('Assign', "Set a"), node('Delay', "Wait"))
+    new = tree(node('Assign', "Set a"), node('LogMessage', "Log"))
+    assert diff_trees(old, new) == [
+        {'op': 'removed', 'path': 'Sequence "Main"', 'activity': 'Delay "Wait"', 'details': []},
+        {'op': 'added', 'path': 'Sequence "Main"', 'activity': 'LogMessage "Log"', 'details': []},
+    ]
+
+
+def test_renamed_child_is_removed_and_added():
+    old = tree(node('Assign', "Set a"))
+    new = tree(node('Assign', "Set b"))
+    assert [(change['op'], change['activity']) for change in diff_trees(old, new)] == [
+        ('removed', 'Assign "Set a"'), ('added', 'Assign "Set b"')
+    ]
+
+
+def test_nested_changes_carry_their_path():
+    old = tree(node('If', "Check", [node('Assign', "Set a", To="[a]")]))
+    new = tree(node('If', "Check", [node('Assign', "Set a", To="[b]")]))
+    [change] = diff_trees(old, new)
+    assert change['path'] == 'Sequence "Main" > If "Check"'
+
+
+def test_renamed_root_is_reported():
+    changes = diff_trees(tree(node('Assign', "Set a")), tree(node('Assign', "Set a"), display_name="Process"))
+    assert changes == [
+        {'op': 'changed', 'path': '', 'activity': 'Sequence "Process"', 'details': ['DisplayName: Main → Process']}
+    ]
+
+
+def test_root_of_another_type_is_reported():
+    old = tree(node('Assign', "Set a"))
+    new = node('Flowchart', "Main", [node('Assign', "Set a")])
+    [change] = diff_trees(old, new)
+    assert change['details'] == ['Type: Sequence → Flowchart']
+
+
+def test_structural_diff_of_renamed_root_sequence(sample_xaml):
+    renamed = sample_xaml.replace('<Sequence DisplayName="Main"', '<Sequence DisplayName="Process"')
+    changes = structural_diff(sample_xaml, renamed)
+    assert [change['details'] for change in changes] == [['DisplayName: Main → Process']]
@@ -0,0 +1,45 @@
+import pytest
+
+from intent_router import classify_intent
+from workflow_service import ROUTER_CONFIG
+
+FILE_NAMES = ['Main.xaml', 'Other.xaml']
+THRESHOLD = ROUTER_CONFIG['min_confidence']
+
+# message, expected flags (modify_code, modify_docs, explain), file_indices, routed locally
+CASES = [
+    ("What does Other.xaml do", (False, False, True), [1], True),
+    ("Does Main.xaml use a retry?", (False, False, True), [0], True),
+    ("Explain the workflow", (False, False, True), [], True),
+    ("Do the docs mention the timeout?", (False, False, True), [], True),
+    ("Have the docs been updated?", (False, False, True), [], True),
+    ("How do I add a retry?", (False, False, True), [], False),
+    ("Add a log message to Main.xaml", (True, True, False), [0], True),
+    ("Could you add a delay to Main.xaml", (True, True, False), [0], True),
+    ("Rename the variable greeting", (True, True, False), [], False),
+    ("Update the documentation headings", (False, True, False), [], True),
+    ("Update the documentation of the Assign activity", (False, True, False), [], False),
+    ("Don't add emojis to the documentation", (False, True, False), [], True),
+    ("Do not use emojis in the documentation", (False, True, False), [], False),
+    ("Don't use emojis in the docs", (False, True, False), [], False),
+    ("Have the docs list every argument", (False, True, False), [], False),
+    ("thanks", (False, False, False), [], False),
+]
+
+
+@pytest.mark.parametrize('message, flags, file_indices, local', CASES)
+def test_classify_intent(message, flags, file_indices, local):
+    analysis = classify_intent(message, FILE_NAMES)
+    assert (analysis['modify_code'], analysis['modify_docs'], analysis['explain']) == flags
+    assert analysis['file_indices'] == file_indices
+    assert (analysis['confidence'] >= THRESHOLD) == local
+
+
+def test_single_file_project_defaults_to_that_file():
+    analysis = classify_intent("Rename the variable greeting", ['Main.xaml'])
+    assert analysis['file_indices'] == [0]
+    assert analysis['confidence'] >= THRESHOLD
+
+
+def test_all_files():
+    assert classify_intent("Add a log message to all files", FILE_NAMES)['file_indices'] == [0, 1]
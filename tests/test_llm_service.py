@@ -0,0 +1,30 @@
+import pytest
+
+import llm_service
+
+
+@pytest.fixture
+def client_config(monkeypatch):
+    monkeypatch.setattr(llm_service, 'CLIENT_CONFIG', {'api_key': None, 'base_url': None, 'backend': 'openai'})
+    monkeypatch.delenv('OPENAI_BASE_URL', raising=False)
+    return llm_service.CLIENT_CONFIG
+
+
+def test_cache_scope_is_empty_for_the_real_api(client_config):
+    assert llm_service.cache_scope() == {}
+
+
+def test_cache_scope_includes_configured_base_url(client_config):
+    client_config['base_url'] = "http://127.0.0.1:8700/v1"
+    assert llm_service.cache_scope() == {'backend': 'openai', 'base_url': "http://127.0.0.1:8700/v1"}
+
+
+def test_cache_scope_includes_base_url_from_environment(client_config, monkeypatch):
+    # The openai client reads OPENAI_BASE_URL itself when no base_url is configured
+    monkeypatch.setenv('OPENAI_BASE_URL', "http://127.0.0.1:8700/v1")
+    assert llm_service.cache_scope() == {'backend': 'openai', 'base_url': "http://127.0.0.1:8700/v1"}
+
+
+def test_cache_scope_separates_the_mock_backend(client_config):
+    client_config['backend'] = 'mock'
+    assert llm_service.cache_scope() == {'backend': 'mock', 'base_url': None}
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import workflow_service
+from xaml_compaction import compact_xaml
+
+IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Answers model calls from a list, recording the prompts and the answers dropped from the cache"""
+    calls = {'answers': [], 'prompts': [], 'forgotten': []}
+
+    def request_completion(prompt, *args, **kwargs):
+        calls['prompts'].append(prompt)
+        return calls['answers'].pop(0)
+
+    monkeypatch.setitem(workflow_service.MODIFY_CONFIG, 'mode', 'patch')
+    monkeypatch.setattr(workflow_service, 'request_completion', request_completion)
+    monkeypatch.setattr(workflow_service, 'forget_completion',
+                        lambda prompt, *args, **kwargs: calls['forgotten'].append(prompt))
+    return calls
+
+
+def edits(*pairs):
+    return json.dumps({'edits': [{'find': find, 'replace': replace} for find, replace in pairs]})
+
+
+def modify(sample_xaml):
+    return workflow_service.modify_xaml({'name': 'Main.xaml', 'content': sample_xaml}, "change it", "File 0: Main.xaml")
+
+
+def test_edit_matching_the_original_leaves_everything_else_untouched(model, sample_xaml):
+    model['answers'].append(edits(('DisplayName="Show greeting"', 'DisplayName="Show the greeting"')))
+
+    result = modify(sample_xaml)
+
+    assert result == sample_xaml.replace('DisplayName="Show greeting"', 'DisplayName="Show the greeting"')
+    assert len(model['prompts']) == 1
+
+
+def test_edit_matching_only_the_compacted_text_is_applied_there(model, sample_xaml):
+    # lxml writes self-closing tags without the space the original file has
+    find = 'AnnotationText="Shows the greeting"/>'
+    assert find not in sample_xaml and find in compact_xaml(sample_xaml)[0]
+    model['answers'].append(edits((find, 'AnnotationText="Shows the greeting and waits"/>')))
+
+    result = modify(sample_xaml)
+
+    assert 'AnnotationText="Shows the greeting and waits"' in result
+    assert result.startswith('<?xml version="1.0" encoding="utf-8"?>')
+    assert IMAGE in result
+    assert "WorkflowViewStateService.ViewState" in result
+    assert "TextExpression.NamespacesForImplementation" in result
+    assert len(model['prompts']) == 1
+
+
+def test_edits_that_do_not_apply_fall_back_to_regeneration(model, sample_xaml):
+    compacted, _ = compact_xaml(sample_xaml)
+    model['answers'].append(edits(('DisplayName="Missing"', 'DisplayName="Other"')))
+    model['answers'].append("```xml\n" + compacted.replace('"Hello"', '"Hi"') + "\n```")
+
+    result = modify(sample_xaml)
+
+    assert '"Hi"' in result
+    assert IMAGE in result
+    assert "WorkflowViewStateService.ViewState" in result
+    assert "Return only the complete modified XAML code" in model['prompts'][1]
+    assert model['forgotten'] == []
+
+
+def test_unparsable_edits_are_dropped_from_the_cache(model, sample_xaml):
+    compacted, _ = compact_xaml(sample_xaml)
+    model['answers'] += ["not json", compacted]
+
+    modify(sample_xaml)
+
+    assert model['forgotten'] == [model['prompts'][0]]
+    assert len(model['prompts']) == 2
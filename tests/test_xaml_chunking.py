@@ -0,0 +1,34 @@
+import re
+
+import pytest
+
+from benchmark import generate_workflow
+from xaml_chunking import estimate_tokens, split_xaml
+from xaml_compaction import compact_xaml
+
+# Leaf activities; containers that are split only show up in the context comments
+ACTIVITY_ID = re.compile(r'IdRef="((?:Assign|LogMessage|MessageBox|TypeInto|InvokeWorkflowFile)_\d+)"')
+
+
+@pytest.mark.parametrize('activities, depth', [(600, 5), (600, 40), (1400, 700)])
+def test_split_xaml_keeps_every_activity_within_budget(activities, depth):
+    content = compact_xaml(generate_workflow(activities=activities, depth=depth))[0]
+
+    chunks = split_xaml(content, 2000)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 2000 for chunk in chunks)
+    ids = ACTIVITY_ID.findall(content)
+    assert len(ids) == activities
+    assert sorted(ids) == sorted(ACTIVITY_ID.findall("".join(chunks)))
+
+
+def test_small_content_is_one_chunk(sample_xaml):
+    assert split_xaml(sample_xaml, 10000) == [sample_xaml]
+
+
+def test_chunks_name_the_activities_they_are_nested_in():
+    chunks = split_xaml(compact_xaml(generate_workflow(activities=600, depth=40))[0], 2000)
+    comments = [chunk.split("\n", 1)[0] for chunk in chunks[1:]]
+    assert all(comment.startswith("<!-- inside Activity > Sequence \"Main\"") for comment in comments)
+    assert any(" > … > " in comment for comment in comments)
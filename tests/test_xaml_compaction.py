@@ -0,0 +1,68 @@
+from lxml import etree
+
+from benchmark import generate_workflow
+from xaml_compaction import compact_xaml, restore_xaml
+
+IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+LOG_MESSAGE = '<ui:LogMessage DisplayName="Log greeting" Message="[greeting]" />'
+
+
+def test_compact_xaml_strips_designer_noise(sample_xaml):
+    compacted, stash = compact_xaml(sample_xaml)
+    assert "WorkflowViewStateService.ViewState" not in compacted
+    assert "NamespacesForImplementation" not in compacted
+    assert IMAGE not in compacted
+    assert 'Image="__image_0__"' in compacted
+    assert stash['images'] == {'__image_0__': IMAGE}
+    # IdRefs and annotations stay, they anchor the stash and carry meaning
+    assert 'WorkflowViewState.IdRef="Assign_1"' in compacted
+    assert 'AnnotationText="Shows the greeting"' in compacted
+
+
+def test_restore_xaml_after_inserting_an_activity(sample_xaml):
+    compacted, stash = compact_xaml(sample_xaml)
+    assign_end = compacted.index("</Assign>") + len("</Assign>")
+    edited = compacted[:assign_end] + "\n    " + LOG_MESSAGE + compacted[assign_end:]
+
+    restored = restore_xaml(edited, stash)
+
+    assert restored.startswith('<?xml version="1.0" encoding="utf-8"?>')
+    assert IMAGE in restored
+    assert "__image_0__" not in restored
+    root = etree.fromstring(restored.split("\n", 1)[1].encode('utf-8'))
+    sequence = root.find("{*}Sequence")
+    # The ViewState goes back into the Sequence it was taken from, ahead of the activities
+    view_state = sequence.find("{*}WorkflowViewStateService.ViewState")
+    assert view_state is not None
+    assert sequence.index(view_state) == 1
+    assert root.find("{*}TextExpression.NamespacesForImplementation") is not None
+    children = [child.get("DisplayName") for child in sequence if child.get("DisplayName")]
+    assert children == ["Set greeting", "Log greeting", "Show greeting", "Check length"]
+
+
+def test_restore_xaml_does_not_duplicate_parts_the_model_kept(sample_xaml):
+    _, stash = compact_xaml(sample_xaml)
+    restored = restore_xaml(sample_xaml.split("\n", 1)[1], stash)
+    assert restored.count("WorkflowViewStateService.ViewState>") == 2
+    assert restored.count("<TextExpression.NamespacesForImplementation>") == 1
+
+
+def test_restore_xaml_keeps_declaration_of_file_without_designer_noise():
+    content = '<?xml version="1.0" encoding="utf-8"?>\n<Sequence DisplayName="Main"><Assign DisplayName="Set a" /></Sequence>'
+    compacted, stash = compact_xaml(content)
+    assert not compacted.startswith("<?xml")
+
+    restored = restore_xaml(compacted.replace("Set a", "Set b"), stash)
+
+    assert restored.startswith('<?xml version="1.0" encoding="utf-8"?>\n<Sequence')
+    assert restored.count("<?xml") == 1
+
+
+def test_deeply_nested_workflow_round_trips():
+    content = generate_workflow(activities=1400, depth=700)
+
+    compacted, stash = compact_xaml(content)
+    restored = restore_xaml(compacted, stash)
+
+    assert "WorkflowViewStateService.ViewState" not in compacted
+    assert restored.count("WorkflowViewStateService.ViewState>") == content.count("WorkflowViewStateService.ViewState>")
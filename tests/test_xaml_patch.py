@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from xaml_patch import PatchError, apply_edits, parse_edits
+
+XAML = """<Sequence DisplayName="Main">
+  <Assign DisplayName="Set a" />
+  <Assign DisplayName="Set b" />
+  <Assign DisplayName="Set b" />
+</Sequence>"""
+
+
+def test_apply_edits_replaces_unique_snippet():
+    result = apply_edits(XAML, [{'find': 'DisplayName="Set a"', 'replace': 'DisplayName="Set x"'}])
+    assert 'DisplayName="Set x"' in result
+    assert 'DisplayName="Set a"' not in result
+
+
+def test_apply_edits_rejects_missing_snippet():
+    with pytest.raises(PatchError, match="found 0 times"):
+        apply_edits(XAML, [{'find': 'DisplayName="Set z"', 'replace': 'DisplayName="Set x"'}])
+
+
+def test_apply_edits_rejects_ambiguous_snippet():
+    with pytest.raises(PatchError, match="found 2 times"):
+        apply_edits(XAML, [{'find': 'DisplayName="Set b"', 'replace': 'DisplayName="Set x"'}])
+
+
+def test_apply_edits_matches_snippet_without_surrounding_whitespace():
+    edit = {'find': '\n    <Assign DisplayName="Set a" />  \n', 'replace': '<Assign DisplayName="Set x" />'}
+    result = apply_edits(XAML, [edit])
+    assert '  <Assign DisplayName="Set x" />\n  <Assign DisplayName="Set b" />' in result
+
+
+def test_apply_edits_rejects_broken_xml():
+    with pytest.raises(PatchError, match="not well-formed"):
+        apply_edits(XAML, [{'find': '<Assign DisplayName="Set a" />', 'replace': '<Assign DisplayName="Set a">'}])
+
+
+def test_apply_edits_applies_edits_in_order():
+    edits = [
+        {'find': 'DisplayName="Set a"', 'replace': 'DisplayName="Set c"'},
+        {'find': 'DisplayName="Set c"', 'replace': 'DisplayName="Set d"'},
+    ]
+    assert 'DisplayName="Set d"' in apply_edits(XAML, edits)
+
+
+def test_parse_edits_reads_edit_list():
+    edits = [{'find': 'a', 'replace': 'b'}]
+    assert parse_edits(json.dumps({'edits': edits})) == edits
+
+
+@pytest.mark.parametrize('response', [
+    "not json",
+    json.dumps({'changes': []}),
+    json.dumps({'edits': [{'find': 'a'}]}),
+    json.dumps({'edits': [{'find': '  ', 'replace': 'b'}]}),
+])
+def test_parse_edits_rejects_malformed_answers(response):
+    with pytest.raises(PatchError):
+        parse_edits(response)
@@ -0,0 +1,35 @@
+from benchmark import generate_workflow
+from xaml_visualizer import parse_xaml_to_dict
+
+
+def count_nodes(tree):
+    stack = [tree]
+    count = 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.get('children', []))
+    return count
+
+
+def test_backends_agree_on_sample(sample_xaml):
+    assert parse_xaml_to_dict(sample_xaml, 'lxml') == parse_xaml_to_dict(sample_xaml, 'bs4')
+
+
+def test_lxml_backend_parses_workflow_past_the_libxml2_depth_limit():
+    content = generate_workflow(activities=3000, depth=1500)
+
+    tree = parse_xaml_to_dict(content, 'lxml')
+
+    assert 'error' not in tree
+    assert tree['nodeName'] == 'Sequence'
+    assert count_nodes(tree) == count_nodes(parse_xaml_to_dict(content, 'bs4'))
+
+
+def test_parser_error_is_reported():
+    result = parse_xaml_to_dict("not xml at all", 'lxml')
+    assert result['error'].startswith("Error parsing XAML: line 1:")
+
+
+def test_missing_activity_is_reported():
+    assert parse_xaml_to_dict("<Root />", 'lxml') == {'error': "No Activity element found in the XAML"}
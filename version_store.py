@@ -0,0 +1,97 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+
+
+class VersionStore:
+    """Version history that keeps every distinct file or documentation text once, zlib-compressed.
+
+    Versions only hold content hashes, so files that did not change between versions share one blob
+    and saving or navigating never copies the whole project.
+    """
+
+    def __init__(self, compression_level=6, decoded_cache_size=64):
+        self.compression_level = compression_level
+        self.decoded_cache_size = decoded_cache_size
+        self._blobs = {}
+        self._raw_sizes = {}
+        self._refcounts = {}
+        self._versions = []
+        self._decoded = OrderedDict()
+
+    def __len__(self):
+        return len(self._versions)
+
+    def _put(self, text):
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if key in self._blobs:
+            self._refcounts[key] += 1
+        else:
+            raw = text.encode('utf-8')
+            self._blobs[key] = zlib.compress(raw, self.compression_level)
+            self._raw_sizes[key] = len(raw)
+            self._refcounts[key] = 1
+        return key
+
+    def _release(self, key):
+        self._refcounts[key] -= 1
+        if self._refcounts[key] == 0:
+            del self._blobs[key]
+            del self._raw_sizes[key]
+            del self._refcounts[key]
+            self._decoded.pop(key, None)
+
+    def text(self, key):
+        """Return the text stored under a content hash"""
+        if key in self._decoded:
+            self._decoded.move_to_end(key)
+            return self._decoded[key]
+
+        text = zlib.decompress(self._blobs[key]).decode('utf-8')
+        self._decoded[key] = text
+        if len(self._decoded) > self.decoded_cache_size:
+            self._decoded.popitem(last=False)
+        return text
+
+    def truncate(self, length):
+        """Drop every version from index length onwards"""
+        for version in self._versions[length:]:
+            for _, key in version['files']:
+                self._release(key)
+            self._release(version['documentation'])
+        del self._versions[length:]
+
+    def save(self, files, documentation, timestamp):
+        """Append a version and return its index"""
+        version = {
+            'timestamp': timestamp,
+            'files': tuple((f['name'], self._put(f['content'])) for f in files),
+            'documentation': self._put(documentation),
+            'version_number': len(self._versions) + 1
+        }
+        self._versions.append(version)
+        return len(self._versions) - 1
+
+    def get(self, index):
+        """Return the metadata of a version: timestamp, version number and content hashes"""
+        return self._versions[index]
+
+    def checkout(self, index):
+        """Return fresh (files, documentation) for a version, safe to modify"""
+        version = self._versions[index]
+        files = [{'name': name, 'content': self.text(key)} for name, key in version['files']]
+        return files, self.text(version['documentation'])
+
+    def memory_footprint(self):
+        """Report stored (compressed) size against the size plain snapshots would take"""
+        snapshot_bytes = sum(
+            sum(self._raw_sizes[key] for _, key in version['files']) + self._raw_sizes[version['documentation']]
+            for version in self._versions
+        )
+        return {
+            'versions': len(self._versions),
+            'blobs': len(self._blobs),
+            'stored_bytes': sum(len(blob) for blob in self._blobs.values()),
+            'unique_bytes': sum(self._raw_sizes.values()),
+            'snapshot_bytes': snapshot_bytes
+        }
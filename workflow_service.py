@@ -0,0 +1,393 @@
+import datetime
+import io
+import json
+import os
+import re
+from zipfile import ZipFile
+from llm_service import (
+    MODEL_CONFIG, get_response_cache, request_completion, forget_completion, stream_completion, collect_stream, run_concurrently, generate_combined_docs
+)
+from xaml_compaction import compact_xaml, restore_xaml
+from xaml_patch import PatchError, apply_edits, parse_edits
+from intent_router import classify_intent, record_route
+from retrieval_index import build_index, retrieve_context
+from telemetry import context as telemetry_context
+from diff_engine import diff_versions, structural_diff_versions, summarize_changes
+
+# Clear chat messages are routed locally, only ambiguous ones are sent to the routing model
+ROUTER_CONFIG = {
+    'local_routing': not os.environ.get('LLM4REUSE_LLM_ROUTING'),
+    'min_confidence': 0.75
+}
+
+# Explanations get the best matching activities, variables and doc sections instead of whole files
+RETRIEVAL_CONFIG = {
+    'enabled': not os.environ.get('LLM4REUSE_INLINE_CONTEXT'),
+    'top_k': 20,
+    'context_tokens': 8000
+}
+
+# Code changes are requested as search/replace edits, full regeneration is only the fallback
+MODIFY_CONFIG = {
+    'mode': os.environ.get('LLM4REUSE_MODIFY_MODE', 'patch')
+}
+
+
+def no_action():
+    return {
+        "modify_code": False,
+        "modify_docs": False,
+        "explain": False,
+        "file_indices": []
+    }
+
+
+def valid_indices(indices, file_count):
+    """Drop duplicates and anything that is not the index of an existing file"""
+    return [idx for idx in dict.fromkeys(indices or []) if isinstance(idx, int) and 0 <= idx < file_count]
+
+
+def files_overview(files):
+    return "\n".join([
+        f"File {i}: {f['name']}"
+        for i, f in enumerate(files)
+    ])
+
+
+def analyze_request(user_input, file_names):
+    """Decide what a chat message asks for: modify_code, modify_docs, explain and the file_indices involved"""
+    analysis = classify_intent(user_input, file_names) if ROUTER_CONFIG['local_routing'] else None
+    if analysis is not None and analysis['confidence'] >= ROUTER_CONFIG['min_confidence']:
+        record_route('local')
+        return analysis
+
+    analysis_prompt = f"""
+    Based on the user's request, determine what actions should be taken.
+    Return a JSON object with these fields:
+    - "modify_code": boolean (true if code should change)
+    - "modify_docs": boolean (true if documentation should change)
+    - "explain": boolean (true if user is asking a question that needs explanation)
+    - "file_indices": array of integers (indices of files to modify, 0-indexed)
+
+    Here are the available files:
+    {', '.join(f"{i}: {name}" for i, name in enumerate(file_names))}
+
+    User's request: {user_input}
+
+    JSON RESPONSE:
+    """
+
+    try:
+        with telemetry_context(call_site='route'):
+            analysis_response = request_completion(analysis_prompt, 16000, True, llm_model=MODEL_CONFIG['router_model'])
+    except Exception:
+        if analysis is None:
+            raise
+        # The routing model is unreachable, the local guess beats failing the whole request
+        record_route('llm_failed')
+        return analysis
+
+    try:
+        analysis = json.loads(analysis_response)
+        record_route('llm')
+    except:
+        # Don't let a broken answer be served from the cache on the next try
+        forget_completion(analysis_prompt, 16000, True, llm_model=MODEL_CONFIG['router_model'])
+        record_route('llm_failed')
+        analysis = no_action()
+    return analysis
+
+
+def clean_code_output(code_text):
+    code_text = re.sub(r'```xml\s*\n', '', code_text)
+    code_text = re.sub(r'\n```\s*$', '', code_text)
+    return code_text
+
+
+def patch_prompt(file_content, file_name, user_input, files_context):
+    return f"""
+    Modify this UiPath XAML code according to the user's request:
+    {user_input}
+
+    Do not return the whole file. Answer with a JSON object of the form
+    {{"edits": [{{"find": "<exact snippet of the original code>", "replace": "<new snippet>"}}]}}
+    Rules for the edits:
+    1. Every find snippet must be copied character for character from the original code and occur exactly once in it
+    2. Keep the snippets small, but include enough of the surrounding activity to make them unique
+    3. To insert an activity, replace a neighbouring snippet with itself plus the new activity
+    4. Return {{"edits": []}} if no change is needed
+
+    Available files:
+    {files_context}
+
+    Working on file: {file_name}
+
+    Original code:
+    {file_content}
+    """
+
+
+def regenerate_prompt(file_content, file_name, user_input, files_context):
+    return f"""
+    Modify this UiPath XAML code according to the user's request:
+    {user_input}
+    Return only the complete modified XAML code.
+
+    Available files:
+    {files_context}
+
+    Working on file: {file_name}
+
+    Original code:
+    {file_content}
+    """
+
+
+def modify_xaml(xaml_file, user_input, files_context, cache=None):
+    """Apply the user's request to one XAML file and return its new content.
+
+    The model is asked for search/replace edits first, so a small change costs a small answer. If the
+    edits don't apply cleanly, the file is regenerated as a whole.
+    """
+    # The model only sees the semantic XAML, designer noise is put back into its answer
+    file_content, stash = compact_xaml(xaml_file['content'])
+
+    if MODIFY_CONFIG['mode'] == 'patch':
+        prompt = patch_prompt(file_content, xaml_file['name'], user_input, files_context)
+        try:
+            with telemetry_context(call_site='modify_patch'):
+                response = request_completion(prompt, responseJsonFormat=True, cache=cache)
+            try:
+                edits = parse_edits(response)
+            except PatchError:
+                forget_completion(prompt, responseJsonFormat=True, cache=cache)
+                raise
+            try:
+                # Snippets that also match the original file are applied there, leaving the rest byte for byte untouched
+                images_only = {'images': stash['images'], 'attributes': [], 'elements': []}
+                return restore_xaml(apply_edits(xaml_file['content'], edits), images_only)
+            except PatchError:
+                return restore_xaml(apply_edits(file_content, edits), stash)
+        except PatchError:
+            # Snippet not found, ambiguous or broken XML: fall through to a full regeneration
+            pass
+
+    prompt = regenerate_prompt(file_content, xaml_file['name'], user_input, files_context)
+    with telemetry_context(call_site='modify_regenerate'):
+        response = request_completion(prompt, cache=cache)
+    return restore_xaml(clean_code_output(response), stash)
+
+
+def modify_files(files, file_indices, user_input, on_progress=None):
+    """Apply the user's request to the given files in parallel.
+
+    Returns {index: new content} for the files that actually changed. Nothing is returned unless every
+    call succeeded, so a failure never leaves a half-applied change. on_progress(done, total) is called
+    as each file finishes; an exception raised by it (e.g. a cancelled job) stops the files not started yet.
+    """
+    file_indices = valid_indices(file_indices, len(files))
+    files_context = files_overview(files)
+    cache = get_response_cache()
+
+    finished = []
+
+    def show_finished_file(index, result):
+        finished.append(index)
+        if on_progress is not None:
+            on_progress(len(finished), len(file_indices))
+
+    modified_codes = run_concurrently(
+        lambda xaml_file: modify_xaml(xaml_file, user_input, files_context, cache),
+        [dict(files[idx]) for idx in file_indices],
+        on_result=show_finished_file)
+
+    return {
+        idx: modified_code
+        for idx, modified_code in zip(file_indices, modified_codes)
+        if modified_code != files[idx]['content']
+    }
+
+
+def explanation_prompt(files, documentation, user_input, file_indices=None):
+    """Prompt for answering a question about the project, with the context relevant to it"""
+    file_indices = valid_indices(file_indices, len(files))
+    file_list = files_overview(files)
+
+    if RETRIEVAL_CONFIG['enabled']:
+        index = build_index(files, documentation)
+        names = {files[idx]['name'] for idx in file_indices} or None
+        context = retrieve_context(index, user_input, RETRIEVAL_CONFIG['context_tokens'],
+                                   RETRIEVAL_CONFIG['top_k'], names)
+        return f"""
+    The user has the following question about the UiPath workflow:
+    {user_input}
+
+    Please provide a detailed and helpful explanation based on the available information.
+    The excerpts below were selected from the documentation and the workflow files as the most relevant to the question.
+
+    Available files:
+    {file_list}
+
+    Relevant excerpts:
+    {context}
+    """
+
+    files_context = ""
+    for idx in file_indices:
+        files_context += f"\nFile: {files[idx]['name']}\n"
+        files_context += f"{compact_xaml(files[idx]['content'])[0]}\n\n"
+    return f"""
+    The user has the following question about the UiPath workflow:
+    {user_input}
+
+    Please provide a detailed and helpful explanation based on the available information.
+
+    Documentation:
+    {documentation}
+
+    Code context:
+    {files_context or file_list}
+    """
+
+
+UNCLEAR_REQUEST_MESSAGE = ("I understood your request, but I'm not sure how to help. "
+                           "Could you please provide more details or rephrase your question?")
+
+
+def process_chat_message(files, documentation, doc_sections, user_input, default_file_index=0, on_progress=None):
+    """Carry out a chat message against a project, without touching the caller's state.
+
+    Returns {'files', 'documentation', 'doc_sections', 'messages', 'changed'}: the new project state,
+    the assistant messages to show and whether a new version should be saved. on_progress, when given,
+    receives {'stage', ...} dicts, including the partial documentation and explanation as they stream in.
+    """
+    report = on_progress or (lambda progress: None)
+    files = [dict(f) for f in files]
+    doc_sections = dict(doc_sections or {})
+    messages = []
+    changed = False
+
+    report({'stage': "Understanding your request..."})
+    analysis = analyze_request(user_input, [f['name'] for f in files])
+
+    if analysis.get("modify_code", False):
+        report({'stage': "Updating XAML code..."})
+        file_indices = analysis.get("file_indices", [default_file_index])
+        modified = modify_files(
+            files, file_indices, user_input,
+            lambda done, total: report({'stage': f"Updating XAML code... ({done}/{total} files)"}))
+        for idx, modified_code in modified.items():
+            files[idx]['content'] = modified_code
+        if modified:
+            changed = True
+            messages.append(f"Updated files: {', '.join(files[idx]['name'] for idx in modified)}")
+
+    if analysis.get("modify_docs", False):
+        report({'stage': "Updating documentation..."})
+        # Only a request about the documentation itself is an instruction for it; after a code change
+        # just the sections of the changed files are rewritten, as their content hash changed
+        docs_request = not analysis.get("modify_code", False)
+        updated_documentation = generate_combined_docs(
+            files, doc_sections,
+            lambda partial: report({'stage': "Updating documentation...", 'documentation': partial}),
+            instruction=user_input if docs_request else None,
+            instruction_files=valid_indices(analysis.get("file_indices", []), len(files)) if docs_request else None)
+        if updated_documentation != documentation:
+            documentation = updated_documentation
+            changed = True
+            messages.append("Documentation has been updated.")
+        elif docs_request:
+            messages.append("The documentation already reflects this request.")
+
+    if analysis.get("explain", False):
+        report({'stage': "Writing the explanation..."})
+        prompt = explanation_prompt(files, documentation, user_input, analysis.get("file_indices", []))
+        with telemetry_context(call_site='explain'):
+            explanation = collect_stream(
+                stream_completion(prompt),
+                lambda partial: report({'stage': "Writing the explanation...", 'explanation': partial}))
+        messages.append(explanation)
+
+    if not analysis.get("modify_code", False) and not analysis.get("modify_docs", False) and not analysis.get("explain", False):
+        messages.append(UNCLEAR_REQUEST_MESSAGE)
+
+    return {
+        'files': files,
+        'documentation': documentation,
+        'doc_sections': doc_sections,
+        'messages': messages,
+        'changed': changed
+    }
+
+
+def document_project(files, doc_sections, message, on_progress=None):
+    """Regenerate the documentation of a project, in the same result shape as process_chat_message"""
+    report = on_progress or (lambda progress: None)
+    doc_sections = dict(doc_sections or {})
+    report({'stage': "Generating documentation..."})
+    documentation = generate_combined_docs(
+        files, doc_sections,
+        lambda partial: report({'stage': "Generating documentation...", 'documentation': partial}))
+    return {
+        'files': [dict(f) for f in files],
+        'documentation': documentation,
+        'doc_sections': doc_sections,
+        'messages': [message] if message else [],
+        'changed': True
+    }
+
+
+def unique_file_name(name, existing_names):
+    """Append _1, _2, ... before the extension until the name is free"""
+    file_name = name
+    counter = 1
+    while file_name in existing_names:
+        name_parts = name.rsplit('.', 1)
+        if len(name_parts) > 1:
+            file_name = f"{name_parts[0]}_{counter}.{name_parts[1]}"
+        else:
+            file_name = f"{name}_{counter}"
+        counter += 1
+    return file_name
+
+
+def create_download_zip(files, documentation):
+    memory_file = io.BytesIO()
+    with ZipFile(memory_file, 'w') as zf:
+        for file in files:
+            zf.writestr(file['name'], file['content'])
+        if documentation:
+            zf.writestr('documentation.txt', documentation)
+    memory_file.seek(0)
+    return memory_file
+
+
+def commit_version(version_store, files, documentation, current_index):
+    """Save files and documentation as the version after current_index, dropping any later versions.
+
+    Returns the index of the new version.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    version_store.truncate(current_index + 1)
+    # The store keeps its own compressed copy of every changed file, unchanged files are shared
+    return version_store.save(files, documentation, timestamp)
+
+
+def version_diffs(version_store, index):
+    """Documentation hunks, per-file hunks and activity-level changes of a version against the one before.
+
+    Returns (None, None, None) for the first version.
+    """
+    if index <= 0:
+        return None, None, None
+    # Hunks are cached per pair of file contents, stepping back and forth does not recompute them
+    docs_diff, code_diff = diff_versions(version_store, index - 1, index)
+    return docs_diff, code_diff, structural_diff_versions(version_store, index - 1, index)
+
+
+def describe_version_changes(version_store, index):
+    """Short activity-level summary of what changed in a version compared to the one before"""
+    if index <= 0:
+        return "Initial version"
+    counts = summarize_changes(structural_diff_versions(version_store, index - 1, index))
+    return f"{counts['added']} activities added, {counts['removed']} removed, {counts['changed']} changed"
@@ -0,0 +1,179 @@
+import math
+import re
+from lxml import etree
+
+CHARS_PER_TOKEN = 4
+# Context comments of deeply nested chunks name only the outermost and the innermost activities
+MAX_PATH_LEVELS = 12
+_XMLNS_PATTERN = re.compile(r'\s+xmlns(:[\w.-]+)?="[^"]*"')
+_encoding = None
+
+
+def _get_encoding():
+    """Use tiktoken when it is installed, otherwise fall back to a character based estimate"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def estimate_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _local_name(tag):
+    if not isinstance(tag, str):
+        return ""
+    return tag.split('}')[-1]
+
+
+def _describe(element):
+    name = _local_name(element.tag)
+    display_name = element.get('DisplayName')
+    return f'{name} "{display_name}"' if display_name else name
+
+
+def _serialize(element):
+    text = etree.tostring(element, encoding='unicode', with_tail=False)
+    # Namespace declarations are repeated on every serialized subtree and carry no meaning for the model
+    return _XMLNS_PATTERN.sub('', text)
+
+
+def _split_text(text, max_tokens):
+    """Last resort for a single element over budget: cut at line boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    current = []
+    current_size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(''.join(current))
+                current, current_size = [], 0
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current_size + len(line) > max_chars and current:
+            pieces.append(''.join(current))
+            current, current_size = [], 0
+        current.append(line)
+        current_size += len(line)
+    if current:
+        pieces.append(''.join(current))
+    return pieces
+
+
+def _subtree_sizes(root):
+    """Approximate serialized length of every element's subtree, in one bottom-up pass.
+
+    Namespace prefixes and escaping are ignored, so the sizes only decide where to look; whether a
+    piece really fits is checked on its serialized text.
+    """
+    elements = list(root.iter(tag=etree.Element))
+    sizes = {}
+    for element in reversed(elements):
+        name = len(_local_name(element.tag))
+        size = 2 * name + 5 + len(element.text or "")
+        size += sum(len(_local_name(key)) + len(value) + 4 for key, value in element.attrib.items())
+        for child in element:
+            size += sizes.get(child, 0) + len(child.tail or "")
+        sizes[element] = size
+    return sizes
+
+
+def _split_element(root, max_tokens):
+    """Yield (path, text) pieces that each fit the budget, descending into children where needed.
+
+    Walks the tree with an explicit stack and serializes a subtree only once it is likely to fit, so
+    deeply nested workflows neither hit the recursion limit nor get serialized again at every level.
+    """
+    sizes = _subtree_sizes(root)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    stack = [(root, "")]
+    while stack:
+        element, path = stack.pop()
+        children = [child for child in element if isinstance(child.tag, str)]
+        if sizes[element] <= max_chars or not children:
+            text = _serialize(element)
+            if estimate_tokens(text) <= max_tokens:
+                yield path, text
+                continue
+            if not children:
+                for piece in _split_text(text, max_tokens):
+                    yield path, piece
+                continue
+
+        child_path = f"{path} > {_describe(element)}" if path else _describe(element)
+        stack.extend((child, child_path) for child in reversed(children))
+
+
+def _context_comment(path):
+    levels = path.split(" > ") if path else []
+    if len(levels) > MAX_PATH_LEVELS:
+        levels = levels[:2] + ["…"] + levels[-(MAX_PATH_LEVELS - 3):]
+    return f"<!-- inside {' > '.join(levels) or 'workflow root'} -->"
+
+
+def split_xaml(content, max_tokens):
+    """Split XAML into chunks of at most max_tokens, cutting only between activities where possible.
+
+    Every chunk after the first starts with a comment naming the activities it is nested in, so the
+    model keeps the context of the parts it documents.
+    """
+    if estimate_tokens(content) <= max_tokens:
+        return [content]
+
+    try:
+        root = etree.fromstring(content.encode('utf-8'), etree.XMLParser(recover=True, huge_tree=True))
+    except etree.XMLSyntaxError:
+        root = None
+    if root is None:
+        return _split_text(content, max_tokens)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    current_path = None
+    for path, text in _split_element(root, max_tokens):
+        piece = text
+        if path != current_path:
+            piece = f"{_context_comment(path)}\n{text}"
+        piece_tokens = estimate_tokens(piece)
+
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+            if path == current_path:
+                piece = f"{_context_comment(path)}\n{text}"
+                piece_tokens = estimate_tokens(piece)
+
+        current.append(piece)
+        current_tokens += piece_tokens
+        current_path = path
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def pack_texts(texts, max_tokens):
+    """Group consecutive texts so each group stays within max_tokens (a single oversized text forms its own group)"""
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,169 @@
+import copy
+import re
+from lxml import etree
+from xaml_visualizer import is_base64_image
+
+PRESENTATION_NAMESPACES = {
+    "http://schemas.microsoft.com/netfx/2009/xaml/activities/presentation",
+    "http://schemas.microsoft.com/netfx/2010/xaml/activities/presentation",
+}
+ID_REF = "{http://schemas.microsoft.com/netfx/2010/xaml/activities/presentation}WorkflowViewState.IdRef"
+ANNOTATION = "{http://schemas.microsoft.com/netfx/2010/xaml/activities/presentation}Annotation.AnnotationText"
+KEPT_ATTRIBUTES = {ID_REF, ANNOTATION}
+
+NOISE_ELEMENTS = (
+    "WorkflowViewStateService.ViewState",
+    "WorkflowViewState.ViewStateManager",
+    "TextExpression.NamespacesForImplementation",
+    "TextExpression.ReferencesForImplementation",
+)
+IMAGE_PLACEHOLDER = re.compile(r'__image_(\d+)__')
+XML_DECLARATION = re.compile(r'^\ufeff?\s*(<\?xml[^>]*\?>)')
+
+
+def _local_name(tag):
+    return tag.split('}')[-1] if isinstance(tag, str) else ""
+
+
+def _namespace(tag):
+    return tag[1:].split('}')[0] if tag.startswith('{') else ""
+
+
+def _is_noise_element(element):
+    return _local_name(element.tag).startswith(NOISE_ELEMENTS)
+
+
+def _is_noise_attribute(name):
+    return name not in KEPT_ATTRIBUTES and _namespace(name) in PRESENTATION_NAMESPACES
+
+
+def _walk(element):
+    """Yield element and its descendants in document order, without descending into designer noise.
+
+    Uses an explicit stack, deeply nested workflows would exceed the recursion limit otherwise.
+    """
+    stack = [element]
+    while stack:
+        element = stack.pop()
+        yield element
+        children = [child for child in element if isinstance(child.tag, str) and not _is_noise_element(child)]
+        stack.extend(reversed(children))
+
+
+def _anchor(element, root):
+    """Identify an element so stripped parts can find their way back after the model edited the file"""
+    id_ref = element.get(ID_REF)
+    if id_ref:
+        return ('id', id_ref)
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return ('path', tuple(reversed(path)))
+
+
+def _resolve(anchor, root, ids):
+    kind, value = anchor
+    if kind == 'id':
+        return ids.get(value)
+    element = root
+    for index in value:
+        children = list(element)
+        if index >= len(children):
+            return None
+        element = children[index]
+    return element
+
+
+def compact_xaml(content):
+    """Strip designer-only noise from XAML before it is sent to the model.
+
+    Returns the compacted XAML and a stash that restore_xaml uses to put the stripped ViewState,
+    presentation attributes and base64 images back into the (possibly modified) output.
+    """
+    declaration = XML_DECLARATION.match(content)
+    stash = {
+        'declaration': declaration.group(1) if declaration else '',
+        'attributes': [],
+        'elements': [],
+        'images': {}
+    }
+    try:
+        root = etree.fromstring(content.encode('utf-8'), etree.XMLParser(huge_tree=True))
+    except (etree.XMLSyntaxError, ValueError):
+        return content, stash
+
+    # Anchors are taken before anything is removed, so path anchors refer to the original layout
+    for element in list(_walk(root)):
+        noise_attributes = {}
+        for name, value in element.attrib.items():
+            if _is_noise_attribute(name):
+                noise_attributes[name] = value
+            elif is_base64_image(value):
+                placeholder = f"__image_{len(stash['images'])}__"
+                stash['images'][placeholder] = value
+                element.set(name, placeholder)
+        noise_children = [child for child in element if isinstance(child.tag, str) and _is_noise_element(child)]
+
+        if not noise_attributes and not noise_children:
+            continue
+
+        anchor = _anchor(element, root)
+        if noise_attributes:
+            stash['attributes'].append((anchor, noise_attributes))
+            for name in noise_attributes:
+                del element.attrib[name]
+        for child in noise_children:
+            stash['elements'].append((anchor, element.index(child), child))
+
+    for _, _, child in stash['elements']:
+        child.getparent().remove(child)
+
+    return etree.tostring(root, encoding='unicode'), stash
+
+
+def _with_declaration(content, stash):
+    """Put the original <?xml ...?> line back in front of content that lost it"""
+    declaration = stash.get('declaration')
+    if not declaration or XML_DECLARATION.match(content):
+        return content
+    return declaration + '\n' + content.lstrip()
+
+
+def restore_xaml(content, stash):
+    """Re-inject what compact_xaml stripped into XAML returned by the model"""
+    restored_images = IMAGE_PLACEHOLDER.sub(
+        lambda match: stash['images'].get(match.group(0), match.group(0)), content)
+    if not stash['attributes'] and not stash['elements']:
+        return _with_declaration(restored_images, stash)
+
+    try:
+        root = etree.fromstring(XML_DECLARATION.sub('', content.strip()).encode('utf-8'), etree.XMLParser(huge_tree=True))
+    except (etree.XMLSyntaxError, ValueError):
+        return _with_declaration(restored_images, stash)
+
+    ids = {element.get(ID_REF): element for element in root.iter(tag=etree.Element) if element.get(ID_REF)}
+
+    # Put removed elements back first, in their original order, so path anchors still line up
+    for anchor, index, child in sorted(stash['elements'], key=lambda item: (len(item[0][1]) if item[0][0] == 'path' else 0, item[1])):
+        parent = _resolve(anchor, root, ids)
+        # Skip parts the model kept in its answer anyway
+        if parent is not None and parent.find(child.tag) is None:
+            parent.insert(min(index, len(parent)), copy.deepcopy(child))
+
+    for anchor, attributes in stash['attributes']:
+        element = _resolve(anchor, root, ids)
+        if element is None:
+            continue
+        for name, value in attributes.items():
+            if name not in element.attrib:
+                element.set(name, value)
+
+    for element in root.iter(tag=etree.Element):
+        for name, value in element.attrib.items():
+            if value in stash['images']:
+                element.set(name, stash['images'][value])
+
+    declaration = stash['declaration'] + '\n' if stash['declaration'] else ''
+    return declaration + etree.tostring(root, encoding='unicode')
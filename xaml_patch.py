@@ -0,0 +1,49 @@
+import json
+from lxml import etree
+
+
+class PatchError(ValueError):
+    """Raised when edits returned by the model cannot be applied safely"""
+
+
+def parse_edits(response_text):
+    """Read the list of {'find', 'replace'} edits from the model's JSON answer"""
+    try:
+        data = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        raise PatchError(f"Edits are not valid JSON: {e}")
+
+    edits = data.get('edits') if isinstance(data, dict) else None
+    if not isinstance(edits, list):
+        raise PatchError("Answer has no list of edits")
+
+    for edit in edits:
+        if not isinstance(edit, dict) or not isinstance(edit.get('find'), str) or not isinstance(edit.get('replace'), str):
+            raise PatchError(f"Malformed edit: {edit!r}")
+        if not edit['find'].strip():
+            raise PatchError("Edit with an empty find snippet")
+    return edits
+
+
+def apply_edits(content, edits):
+    """Apply search/replace edits to XAML and check that the result is still well-formed.
+
+    Every snippet must occur exactly once in the text it is applied to, so an edit can never land in the
+    wrong place; anything else raises PatchError and the caller falls back to regenerating the file.
+    """
+    for edit in edits:
+        find = edit['find']
+        count = content.count(find)
+        if count == 0:
+            # Models often add or drop surrounding whitespace when copying a snippet
+            find = find.strip()
+            count = content.count(find)
+        if count != 1:
+            raise PatchError(f"Snippet found {count} times: {find[:80]!r}")
+        content = content.replace(find, edit['replace'], 1)
+
+    try:
+        etree.fromstring(content.strip().encode('utf-8'), etree.XMLParser(huge_tree=True))
+    except etree.XMLSyntaxError as e:
+        raise PatchError(f"Patched XAML is not well-formed: {e}")
+    return content
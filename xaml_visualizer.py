@@ -1,5 +1,13 @@
+import io
+import os
 import re
 from bs4 import BeautifulSoup
+from lxml import etree
+from shared_cache import get_cache, content_key
+
+# "lxml" streams the document with iterparse, "bs4" is the original BeautifulSoup parser
+PARSER_BACKENDS = ("lxml", "bs4")
+DEFAULT_PARSER_BACKEND = os.environ.get("LLM4REUSE_XAML_PARSER", "lxml")
 
 COMPONENTS = {
     "Assign": "📝",
@@ -42,10 +50,163 @@ def is_base64_image(value):
     
     return False
 
-def parse_xaml_to_dict(xaml_string):
+class StreamNode:
+    """Lightweight stand-in for the parts of a BeautifulSoup tag that process_node uses"""
+    __slots__ = ("name", "attrs", "children", "own_text", "tail")
+
+    def __init__(self, name, attrs, children, own_text):
+        self.name = name
+        self.attrs = attrs
+        self.children = children
+        self.own_text = own_text
+        self.tail = ""
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.attrs
+
+    def find_all(self, name=None, recursive=True, limit=None):
+        nodes = self.children if not recursive else self._descendants()
+        found = []
+        for node in nodes:
+            if name is None or node.name == name:
+                found.append(node)
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    def find(self, name):
+        for node in self._descendants():
+            if node.name == name:
+                return node
+        return None
+
+    def _descendants(self):
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    @property
+    def text(self):
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            parts.append(item.own_text)
+            for child in reversed(item.children):
+                stack.append(child.tail)
+                stack.append(child)
+        return "".join(parts)
+
+def _bs4_text(value):
+    # BeautifulSoup's xml builder collapses whitespace-only strings to a newline
+    if not value:
+        return ""
+    return value if value.strip() else "\n"
+
+def _qualified_name(name, nsmap):
+    if not name.startswith("{"):
+        return name
+    uri, local_name = name[1:].split("}", 1)
+    for prefix, prefix_uri in nsmap.items():
+        if prefix and prefix_uri == uri:
+            return f"{prefix}:{local_name}"
+    return local_name
+
+def stream_xaml_tree(xaml_string, errors=None):
+    """Build a StreamNode tree with lxml's iterparse, dropping ViewState subtrees and freeing
+    every parsed element as soon as it has been converted.
+
+    The parser recovers from errors, which can leave the tree incomplete; they are appended to errors.
+    """
+    source = io.BytesIO(xaml_string.encode("utf-8"))
+    pending = [[]]
+    skip_depth = 0
+    root = None
+
+    events = etree.iterparse(source, events=("start", "end"), recover=True, huge_tree=True)
+    for event, element in events:
+        local_name = etree.QName(element).localname
+
+        if skip_depth:
+            if event == "start":
+                skip_depth += 1
+            else:
+                skip_depth -= 1
+                if not skip_depth:
+                    element.clear(keep_tail=True)
+            continue
+
+        if event == "start":
+            if local_name.startswith("WorkflowViewStateService.ViewState"):
+                skip_depth = 1
+                continue
+            pending.append([])
+            continue
+
+        children = pending.pop()
+        child_elements = [
+            child for child in element
+            if isinstance(child.tag, str)
+            and not etree.QName(child).localname.startswith("WorkflowViewStateService.ViewState")
+        ]
+        for child_node, child_element in zip(children, child_elements):
+            child_node.tail = _bs4_text(child_element.tail)
+
+        nsmap = element.nsmap
+        attrs = {_qualified_name(name, nsmap): value for name, value in element.attrib.items()}
+        parent = element.getparent()
+        parent_nsmap = parent.nsmap if parent is not None else {}
+        for prefix, uri in nsmap.items():
+            if parent_nsmap.get(prefix) != uri:
+                attrs[f"xmlns:{prefix}" if prefix else "xmlns"] = uri
+
+        node = StreamNode(local_name, attrs, children, _bs4_text(element.text))
+        pending[-1].append(node)
+        root = node
+        element.clear(keep_tail=True)
+
+    if errors is not None:
+        errors.extend(f"line {error.line}: {error.message}" for error in events.error_log)
+    return root
+
+def _parse_with_bs4(xaml_string):
+    soup = BeautifulSoup(xaml_string, 'xml')
+    return soup.find('Activity')
+
+def _parse_with_lxml(xaml_string):
+    errors = []
+    root = stream_xaml_tree(xaml_string, errors)
+    if errors:
+        # What the recovering parser kept may be truncated, e.g. past libxml2's limit of 2048 nested
+        # elements; BeautifulSoup copes with those files, otherwise report the parser's own error
+        root = _parse_with_bs4(xaml_string)
+        if root is None:
+            raise ValueError(errors[0])
+        return root
+    if root is None:
+        return None
+    if root.name == 'Activity':
+        return root
+    return root.find('Activity')
+
+def parse_xaml_to_dict(xaml_string, backend=None):
     try:
-        soup = BeautifulSoup(xaml_string, 'xml')
-        root = soup.find('Activity')
+        backend = backend or DEFAULT_PARSER_BACKEND
+        if backend not in PARSER_BACKENDS:
+            return {"error": f"Unknown parser backend: {backend}"}
+
+        if backend == "lxml":
+            root = _parse_with_lxml(xaml_string)
+        else:
+            root = _parse_with_bs4(xaml_string)
         
         if not root:
             return {"error": "No Activity element found in the XAML"}
@@ -58,7 +219,8 @@ def parse_xaml_to_dict(xaml_string):
     except Exception as e:
         return {"error": f"Error parsing XAML: {str(e)}"}
 
-def process_node(node):
+def _process_single_node(node):
+    """Convert one activity; its "children" list is left empty and the child nodes are returned alongside"""
     try:
         node_name = node.name
         if ':' in node_name:
@@ -101,7 +263,7 @@ def process_node(node):
         arguments_table = []
         is_unsupported = node_name not in COMPONENTS
         
-        children = []
+        child_nodes = []
         
         for child in node.find_all(recursive=False):
             child_name = child.name
@@ -111,8 +273,7 @@ def process_node(node):
                 continue
                 
             if '.Body' in child_name:
-                for body_child in child.find_all(recursive=False):
-                    children.append(process_node(body_child))
+                child_nodes.extend(child.find_all(recursive=False))
                 continue
                 
             if '.Argument' in child_name:
@@ -133,7 +294,7 @@ def process_node(node):
                 arguments_table.append(arg_info)
                 continue
                 
-            children.append(process_node(child))
+            child_nodes.append(child)
         
         if node_name == "Assign":
             assign_to = node.find("Assign.To")
@@ -142,7 +303,7 @@ def process_node(node):
                 main_args.append({"name": "Assign To", "value": assign_to.text.strip() if assign_to.text else ""})
             if assign_value:
                 main_args.append({"name": "Assign Value", "value": assign_value.text.strip() if assign_value.text else ""})
-            children = []
+            child_nodes = []
             
         elif node_name in ["MessageBox", "Comment"]:
             message_text = node.get('Text', 'No Message')
@@ -158,7 +319,7 @@ def process_node(node):
             text = node.get('Text', 'Text not Specified')
             main_args.append({"name": "Text", "value": text})
             attributes = [attr for attr in attributes if attr["name"] != "Text"]
-            children = []
+            child_nodes = []
             
         elif node_name == "If":
             condition = node.get('Condition', 'Condition not Specified')
@@ -198,10 +359,10 @@ def process_node(node):
                         in_args.append(f"{arg_type}: {key}")
                     elif 'OutArgument' in arg.name:
                         out_args.append(f"{arg_type}: {key}")
-            children = []
+            child_nodes = []
             
         elif node_name == "Click":
-            children = []
+            child_nodes = []
         
         return {
             "nodeName": node_name,
@@ -212,15 +373,30 @@ def process_node(node):
             "mainArgs": main_args,
             "inArgs": in_args,
             "outArgs": out_args,
-            "children": children,
+            "children": [],
             "isUnsupported": is_unsupported,
             "argumentsTable": arguments_table,
             "base64Images": base64_images
-        }
+        }, child_nodes
     except Exception as e:
-        return {"nodeName": "Error", "error": str(e), "children": []}
+        return {"nodeName": "Error", "error": str(e), "children": []}, []
 
-def generate_visual_html(node, depth=0):
+def process_node(node):
+    """Convert the activity tree below node into nested dicts, using an explicit stack so that deeply
+    nested workflows don't hit the recursion limit"""
+    root, child_nodes = _process_single_node(node)
+    stack = [(root, child_nodes)]
+    while stack:
+        result, child_nodes = stack.pop()
+        for child in child_nodes:
+            child_result, grandchildren = _process_single_node(child)
+            result["children"].append(child_result)
+            if grandchildren:
+                stack.append((child_result, grandchildren))
+    return root
+
+def _node_html(node, depth):
+    """HTML of one activity, split around the place where its children go"""
     try:
         icon = get_icon_for_node(node.get("nodeName", "Unknown"))
         
@@ -294,11 +470,7 @@ def generate_visual_html(node, depth=0):
             ])
             base64_images_html = f'<div class="base64-images">{images_content}</div>'
         
-        children_html = ""
-        for child in node.get("children", []):
-            children_html += generate_visual_html(child, depth + 1)
-        
-        return f'''
+        head = f'''
             <div class="component" style="margin-left: {depth * 1}px; margin-right: 0px; width: calc(100% - {depth * 1}px);">
                 <div class="header">{icon} {node.get("nodeName", "Unknown")}{f' ({node["displayName"]})' if node.get("displayName") else ""}{warning_icon}</div>
                 {annotation_html}
@@ -308,11 +480,32 @@ def generate_visual_html(node, depth=0):
                 {workflow_args_html}
                 {base64_images_html}
                 {attributes_html}
-                <div class="children">{children_html}</div>
+                <div class="children">'''
+        tail = '''</div>
             </div>
         '''
+        return head, tail
     except Exception as e:
-        return f'<div class="error">Error rendering node: {str(e)}</div>'
+        return f'<div class="error">Error rendering node: {str(e)}</div>', None
+
+def generate_visual_html(node, depth=0):
+    """Render the activity tree depth first with an explicit stack, collecting the pieces in a list
+    that is joined once, so the time is linear in the size of the tree however deep it is"""
+    parts = []
+    stack = [(node, depth)]
+    while stack:
+        item, item_depth = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        head, tail = _node_html(item, item_depth)
+        parts.append(head)
+        if tail is None:
+            continue
+        stack.append((tail, None))
+        for child in reversed(item.get("children", [])):
+            stack.append((child, item_depth + 1))
+    return "".join(parts)
 
 def get_xaml_visualization_css():
     return """
@@ -653,8 +846,15 @@ def get_xaml_visualization_css():
     </style>
     """
 
-def render_xaml_visualization(xaml_content):
-    xaml_dict = parse_xaml_to_dict(xaml_content)
+def parse_xaml_cached(xaml_string, backend=None):
+    """parse_xaml_to_dict shared across sessions by content hash; the result must not be modified"""
+    backend = backend or DEFAULT_PARSER_BACKEND
+    # The XAML size is a good enough estimate of the tree's and avoids serializing deeply nested trees
+    return get_cache('parsed_trees').get_or_compute(
+        content_key(xaml_string, backend), lambda: parse_xaml_to_dict(xaml_string, backend), len(xaml_string))
+
+def _render_uncached(xaml_content, backend):
+    xaml_dict = parse_xaml_cached(xaml_content, backend)
     
     if "error" in xaml_dict:
         return f'<div class="error">Failed to parse XAML: {xaml_dict["error"]}</div>'
@@ -665,3 +865,12 @@ def render_xaml_visualization(xaml_content):
     full_html = f'{css}<div class="xaml-visualization">{html_content}</div>'
     
     return full_html
+
+def render_xaml_visualization(xaml_content, backend=None):
+    """Render the visualization HTML, reusing the result for content that was rendered before"""
+    backend = backend or DEFAULT_PARSER_BACKEND
+    return get_cache('visualizations').get_or_compute(
+        content_key(xaml_content, backend), lambda: _render_uncached(xaml_content, backend))
+
+def render_cache_stats():
+    return get_cache('visualizations').stats()